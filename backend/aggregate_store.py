@@ -0,0 +1,248 @@
+"""
+Aggregate Store
+Mergeable counters (count, recommended, playtime minutes) per playtime bin
+and per day of review, kept for every app in data/aggregates/.
+The counters are built from the dataset once; after that new reviews are
+added in O(new rows) and rolling-window questions are answered from the
+daily counters without rescanning any reviews.
+The counters remember the fingerprint of the workbook they were built from
+and are recounted when the workbook is replaced some other way (a new
+export, a manual edit).
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import review_store
+
+AGGREGATES_DIR = os.path.join(review_store.DATA_DIR, "aggregates")
+
+# Playtime bins (in hours), also used by createSentimentVisualization
+PLAYTIME_BINS = [0, 1, 5, 10, 25, 50, 100, 500, 1200]
+PLAYTIME_LABELS = ['0-1h', '1-5h', '5-10h', '10-25h', '25-50h', '50-100h', '100-500h', '500h+']
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+_states = {}        # app_id -> loaded aggregate state
+_known_ids = {}     # app_id -> set of review ids already counted
+_app_locks = {}     # app_id -> Lock, one writer per app at a time
+_locks_lock = threading.Lock()
+
+
+def _app_lock(app_id):
+    with _locks_lock:
+        return _app_locks.setdefault(app_id, threading.Lock())
+
+
+def _counters_path(app_id):
+    return os.path.join(AGGREGATES_DIR, f"{app_id}.json")
+
+
+def _ids_path(app_id):
+    return os.path.join(AGGREGATES_DIR, f"{app_id}.ids")
+
+
+def _empty_counter():
+    return {"count": 0, "recommended": 0, "playtime_minutes": 0}
+
+
+def _empty_state(app_id):
+    return {
+        "app_id": app_id,
+        "updated": None,
+        "total": _empty_counter(),
+        "playtime_bins": {label: _empty_counter() for label in PLAYTIME_LABELS},
+        "days": {},
+    }
+
+
+def _merge(counter, count, recommended, playtime_minutes):
+    counter["count"] += int(count)
+    counter["recommended"] += int(recommended)
+    counter["playtime_minutes"] += int(playtime_minutes)
+
+
+def _add_rows(state, df):
+    """Fold a frame of new reviews into the counters (vectorized, O(len(df)))"""
+    import pandas as pd
+    # The workbook calls the column playtime_at_review_h, but both hold minutes
+    playtime_column = 'playtime_at_review_m' if 'playtime_at_review_m' in df.columns else 'playtime_at_review_h'
+    rows = pd.DataFrame({
+        'recommended': df['recommended'].fillna(False).astype(bool).astype(np.int64).to_numpy(),
+        'playtime_minutes': pd.to_numeric(df[playtime_column], errors='coerce').fillna(0).astype(np.int64).to_numpy(),
+        'day': pd.to_datetime(df['date_of_review']).dt.strftime('%Y-%m-%d').to_numpy(),
+    })
+    rows['playtime_bin'] = pd.cut(rows['playtime_minutes'] / 60, bins=PLAYTIME_BINS,
+                                  labels=PLAYTIME_LABELS, right=False)
+
+    _merge(state["total"], len(rows), rows['recommended'].sum(), rows['playtime_minutes'].sum())
+    by_bin = rows.groupby('playtime_bin', observed=True).agg(
+        count=('recommended', 'size'), recommended=('recommended', 'sum'), playtime=('playtime_minutes', 'sum'))
+    for label, row in by_bin.iterrows():
+        _merge(state["playtime_bins"][str(label)], row['count'], row['recommended'], row['playtime'])
+    by_day = rows.groupby('day').agg(
+        count=('recommended', 'size'), recommended=('recommended', 'sum'), playtime=('playtime_minutes', 'sum'))
+    for day, row in by_day.iterrows():
+        _merge(state["days"].setdefault(day, _empty_counter()), row['count'], row['recommended'], row['playtime'])
+    state["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _save(app_id, state, new_ids):
+    os.makedirs(AGGREGATES_DIR, exist_ok=True)
+    path = _counters_path(app_id)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    # Review ids are appended, so an update writes only the new ones
+    with open(_ids_path(app_id), "a", encoding="utf-8") as f:
+        f.writelines(f"{review_id}\n" for review_id in new_ids)
+
+
+def _build_from_dataset(app_id):
+    """Count every review of the app's dataset once (raises FileNotFoundError without one)"""
+    dataset = review_store.get_dataset(app_id)
+    df = dataset.to_dataframe(columns=['review_id', 'playtime_at_review_h', 'recommended', 'date_of_review'])
+    state = _empty_state(app_id)
+    _add_rows(state, df)
+    state["built_from"] = dataset.fingerprint
+    review_ids = [int(review_id) for review_id in df['review_id']]
+    # Start a fresh id file, the counters above cover exactly these reviews
+    if os.path.exists(_ids_path(app_id)):
+        os.remove(_ids_path(app_id))
+    _save(app_id, state, review_ids)
+    return state, set(review_ids)
+
+
+def _load(app_id, fingerprint=None):
+    """
+    Loaded (state, known ids) for an app, read from disk or built on first use.
+    Counters not built from `fingerprint` (by default the current dataset's)
+    are rebuilt from the dataset. Call with the app lock held
+    """
+    state = _states.get(app_id)
+    known_ids = _known_ids.get(app_id)
+    if state is None:
+        try:
+            with open(_counters_path(app_id), "r", encoding="utf-8") as f:
+                state = json.load(f)
+            with open(_ids_path(app_id), "r", encoding="utf-8") as f:
+                known_ids = {int(line) for line in f if line.strip()}
+        except (OSError, ValueError):
+            state = None
+
+    if fingerprint is None:
+        try:
+            fingerprint = review_store.get_dataset(app_id).fingerprint
+        except FileNotFoundError:
+            # Counters fed by fetch_steam_data before the app has a workbook in data/
+            if state is None:
+                raise
+    if state is None or (fingerprint is not None and state.get("built_from") != fingerprint):
+        if state is not None:
+            print(f"Aggregates of app {app_id} were built from another version of its workbook, recounting")
+        state, known_ids = _build_from_dataset(app_id)
+    _states[app_id] = state
+    _known_ids[app_id] = known_ids
+    return state, known_ids
+
+
+def get_aggregates(app_id):
+    """
+    A snapshot of the app's counters: total, playtime_bins and days
+    (each with count, recommended and playtime_minutes)
+    """
+    app_id = str(app_id)
+    with _app_lock(app_id):
+        return copy.deepcopy(_load(app_id)[0])
+
+
+def add_reviews(app_id, df, previous_fingerprint=None):
+    """
+    Add newly fetched reviews (a reviews_to_dataframe frame) to the app's counters.
+    Reviews that were already counted are skipped, so re-adding a page is harmless.
+    When df has just been merged into the workbook, previous_fingerprint is the
+    workbook's fingerprint before the merge: counters built from it are updated
+    in place and then marked as built from the new workbook.
+    Returns how many reviews were new - Called by fetch_steam_data and dataset_refresh
+    """
+    app_id = str(app_id)
+    if df.empty:
+        return 0
+    import pandas as pd
+    with _app_lock(app_id):
+        state, known_ids = _load(app_id, fingerprint=previous_fingerprint)
+        review_ids = pd.to_numeric(df['review_id']).astype(np.int64)
+        is_new = ~review_ids.duplicated().to_numpy() & np.array([review_id not in known_ids for review_id in review_ids])
+        new_rows = df[is_new]
+        new_ids = [int(review_id) for review_id in review_ids[is_new]]
+        if previous_fingerprint is not None:
+            state["built_from"] = review_store.source_fingerprint(app_id)
+        elif not new_ids:
+            return 0
+        if new_ids:
+            _add_rows(state, new_rows)
+        _save(app_id, state, new_ids)
+        known_ids.update(new_ids)
+        return len(new_ids)
+
+
+def rebuild(app_id):
+    """Throw the counters away and recount the dataset (after the workbook was replaced wholesale)"""
+    app_id = str(app_id)
+    with _app_lock(app_id):
+        state, known_ids = _build_from_dataset(app_id)
+        _states[app_id] = state
+        _known_ids[app_id] = known_ids
+        return state
+
+
+def rolling_ratios(app_id, windows=(7, 30), days=90):
+    """
+    Recommended ratio over the last `window` days, for each of the last `days`
+    days up to the newest review, read from the daily counters only.
+    Returns {"last_day", "windows": {window: {"count", "recommended_ratio", "series"}}}.
+    """
+    import pandas as pd
+    state = get_aggregates(app_id)
+    if not state["days"]:
+        return {"last_day": None, "windows": {str(window): {"count": 0, "recommended_ratio": None, "series": []}
+                                             for window in windows}}
+
+    # Daily counters laid out on a continuous calendar, so a window is a difference of prefix sums
+    calendar = pd.date_range(min(state["days"]), max(state["days"]), freq='D')
+    counts = np.zeros(len(calendar) + 1, dtype=np.int64)
+    recommended = np.zeros(len(calendar) + 1, dtype=np.int64)
+    for day, counter in state["days"].items():
+        position = (pd.Timestamp(day) - calendar[0]).days + 1
+        counts[position] = counter["count"]
+        recommended[position] = counter["recommended"]
+    counts = np.cumsum(counts)
+    recommended = np.cumsum(recommended)
+
+    first = max(0, len(calendar) - days)
+    result = {}
+    for window in windows:
+        ends = np.arange(first, len(calendar)) + 1
+        starts = np.maximum(ends - window, 0)
+        window_counts = counts[ends] - counts[starts]
+        window_recommended = recommended[ends] - recommended[starts]
+        series = [{
+            "date": calendar[end - 1].strftime('%Y-%m-%d'),
+            "count": int(count),
+            "recommended_ratio": round(float(rec) / count, 3) if count else None,
+        } for end, count, rec in zip(ends, window_counts, window_recommended)]
+        latest = series[-1] if series else {"count": 0, "recommended_ratio": None}
+        result[str(window)] = {
+            "count": latest["count"],
+            "recommended_ratio": latest["recommended_ratio"],
+            "series": series,
+        }
+    return {"last_day": calendar[-1].strftime('%Y-%m-%d'), "windows": result}
@@ -0,0 +1,199 @@
+"""
+Analysis Cache
+Caches the finished /returnReview JSON so reopening a review does not redo
+the sentence and sliding window analysis.
+Entries are keyed by (app_id, review_id, text hash, lexicon version,
+window_size, step_size), so an edited review or a changed sentiment
+dictionary can never be served a stale result.
+Disk entries expire after the same TTL as memory entries, and the directory is
+pruned to DISK_CACHE_MAX_ENTRIES / DISK_CACHE_MAX_BYTES, oldest files first.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DISK_CACHE_DIR = os.path.join(BASE_DIR, "..", "data", "analysis_cache")
+
+# In-memory tier: most recently used results, each kept for at most RESULT_CACHE_TTL seconds
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_TTL = 60 * 60
+# Disk tier survives restarts; set to False to keep results in memory only
+USE_DISK_CACHE = True
+# Size caps of the disk tier, enforced on the first and then every DISK_PRUNE_INTERVAL-th write
+DISK_CACHE_MAX_ENTRIES = 20000
+DISK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+DISK_PRUNE_INTERVAL = 200
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+def make_key(app_id, review_id, review_text, lexicon_version, window_size, step_size):
+    text_hash = hashlib.sha1(review_text.encode("utf-8")).hexdigest()
+    return (str(app_id), int(review_id), text_hash, lexicon_version, int(window_size), int(step_size))
+
+
+class AnalysisCache:
+    """Thread-safe LRU with TTL and size eviction, backed by an optional directory of JSON files"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL, disk_dir=None,
+                 disk_max_entries=DISK_CACHE_MAX_ENTRIES, disk_max_bytes=DISK_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        # The first write prunes whatever a previous run left behind
+        self._writes_since_prune = DISK_PRUNE_INTERVAL - 1
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, name[:2], f"{name}.json")
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        value, age = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            # Back in memory for what is left of its TTL, not a fresh one
+            self._store(key, value, now - age)
+        return value
+
+    def put(self, key, value):
+        """Store a JSON-serialisable value in memory (and on disk if enabled)"""
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        self._write_disk(key, value)
+
+    def _store(self, key, value, now):
+        self._entries[key] = (now + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        """(value, age in seconds) of the disk entry for key, or (None, None) if missing or expired"""
+        if not self.disk_dir:
+            return None, None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        # Guard against (very unlikely) file name collisions
+        if stored.get("key") != list(key):
+            return None, None
+        age = max(time.time() - stored.get("stored_at", 0), 0.0)
+        if age >= self.ttl_seconds:
+            self._remove_disk(path)
+            return None, None
+        return stored["value"], age
+
+    def _remove_disk(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": list(key), "stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # The disk tier is only an optimisation, never fail the request for it
+            print(f"WARNING: could not write analysis cache entry: {e}")
+            return
+        with self._lock:
+            self._writes_since_prune += 1
+            due = self._writes_since_prune >= DISK_PRUNE_INTERVAL
+            if due:
+                self._writes_since_prune = 0
+        if due:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Delete expired disk entries, then the oldest ones until the entry and byte caps hold"""
+        if not self.disk_dir:
+            return 0
+        # A prune already running will do
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            files = []
+            for path in glob.glob(os.path.join(self.disk_dir, "*", "*.json")):
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, info.st_size, path))
+            files.sort()
+
+            expired_before = time.time() - self.ttl_seconds
+            total_bytes = sum(size for _, size, _ in files)
+            remaining = len(files)
+            removed = 0
+            for mtime, size, path in files:
+                if mtime >= expired_before and remaining <= self.disk_max_entries and total_bytes <= self.disk_max_bytes:
+                    break
+                self._remove_disk(path)
+                remaining -= 1
+                total_bytes -= size
+                removed += 1
+            with self._lock:
+                self.disk_evictions += removed
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "disk_evictions": self.disk_evictions,
+                "misses": self.misses,
+            }
+
+
+# Process-wide cache used by main.py's /returnReview
+result_cache = AnalysisCache(disk_dir=DISK_CACHE_DIR if USE_DISK_CACHE else None)
@@ -0,0 +1,260 @@
+"""
+Bulk Scoring
+Scores every review of a steam_reviews_<app_id>.xlsx dataset in one pass.
+Reviews are formatted with reviewMethods.format_review, then all tokens are
+mapped to lexicon ids and summed with NumPy instead of one dict lookup per word.
+Scores are kept per app in data/scores/ (written here and by corpus_scoring),
+next to a small JSON file naming the workbook and lexicon they were scored from.
+
+Usage:
+    python backend/bulk_scoring.py 315210 --output scores_315210.csv
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import review_store
+import reviewMethods
+import sentiment_dict
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+SCORE_COLUMNS = ['review_id', 'recommended', 'num_sentences', 'total_score',
+                 'positive_score', 'negative_score', 'max_sentence_score', 'min_sentence_score']
+
+SCORES_DIR = os.path.join(review_store.DATA_DIR, "scores")
+
+# How many apps' scores to keep in memory at once (least recently used is dropped)
+MAX_CACHED_SCORES = 4
+
+# app_id -> (dataset version, lexicon version, scores DataFrame), so the endpoint only rescores after a change
+_scores_cache = OrderedDict()
+_scores_lock = threading.Lock()
+
+
+def score_file_path(app_id, output_dir=None):
+    return os.path.join(output_dir or SCORES_DIR, f"steam_reviews_{app_id}_scores.csv")
+
+
+def _score_info_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def write_score_file(app_id, scores, built_from, lexicon_version, output_dir=None):
+    """
+    Write an app's scores (rows in workbook order) plus the fingerprint of the
+    workbook and the lexicon version they come from. Returns the score file path
+    """
+    path = score_file_path(app_id, output_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    scores.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    # Written second: a score file without matching info is only ever treated as stale
+    info_path = _score_info_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"built_from": built_from, "lexicon_version": lexicon_version, "reviews": len(scores)}, f)
+    os.replace(tmp_path, info_path)
+    return path
+
+
+def read_score_file(app_id, output_dir=None):
+    """(scores DataFrame, info dict) of an app's score file, or None if there is none"""
+    import pandas as pd
+    path = score_file_path(app_id, output_dir)
+    try:
+        scores = pd.read_csv(path)
+    except (OSError, ValueError):
+        return None
+    try:
+        with open(_score_info_path(path), "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        info = {}   # written before the info file existed, its origin is unknown
+    return scores, info
+
+
+def _tokenize(texts):
+    """
+    Format every review once and flatten the result into
+    tokens, words per sentence and the review each sentence belongs to
+    """
+    tokens = []
+    sentence_lengths = []
+    review_of_sentence = []
+    for review_number, text in enumerate(texts):
+        if not isinstance(text, str):
+            continue # Empty reviews are read back as NaN
+        for sentence in reviewMethods.format_review(text):
+            words = sentence.split()
+            tokens.extend(words)
+            sentence_lengths.append(len(words))
+            review_of_sentence.append(review_number)
+    return tokens, np.array(sentence_lengths, dtype=np.int64), np.array(review_of_sentence, dtype=np.int64)
+
+
+def score_texts(texts, matcher=None):
+    """
+    Score a list of review texts in one vectorized pass.
+    Returns a DataFrame with one row per text: num_sentences, total_score,
+    positive_score, negative_score, max_sentence_score and min_sentence_score
+    (sentence scores match reviewMethods.sentence_score_calculator).
+    """
+    import pandas as pd
+    if matcher is None:
+        matcher = reviewMethods.get_phrase_matcher()
+    num_reviews = len(texts)
+    tokens, sentence_lengths, review_of_sentence = _tokenize(texts)
+
+    # Map every token to a vocabulary id, then look scores up once per distinct word
+    token_ids, vocabulary = pd.factorize(pd.Series(tokens, dtype=object))
+    word_entries = matcher.word_entries
+    vocabulary_scores = np.array([word_entries.get(word, 0.0) for word in vocabulary], dtype=np.float64)
+    token_scores = vocabulary_scores[token_ids] if len(tokens) else np.zeros(0)
+
+    # Only sentences containing the first word of a multi-word entry can hold a phrase;
+    # those few are rescored word by word with the lexicon automaton
+    starts_phrase = np.array([word in matcher.first_words for word in vocabulary], dtype=bool)
+    if len(tokens) and starts_phrase.any():
+        sentence_starts = np.concatenate(([0], np.cumsum(sentence_lengths)))
+        sentence_of_token = np.repeat(np.arange(len(sentence_lengths)), sentence_lengths)
+        for sentence in np.unique(sentence_of_token[starts_phrase[token_ids]]):
+            start, end = sentence_starts[sentence], sentence_starts[sentence + 1]
+            token_scores[start:end] = matcher.word_scores(tokens[start:end])
+
+    sentence_of_token = np.repeat(np.arange(len(sentence_lengths)), sentence_lengths)
+    review_of_token = review_of_sentence[sentence_of_token]
+
+    sentence_scores = np.bincount(sentence_of_token, weights=token_scores, minlength=len(sentence_lengths))
+    total = np.bincount(review_of_token, weights=token_scores, minlength=num_reviews)
+    positive = np.bincount(review_of_token, weights=np.clip(token_scores, 0, None), minlength=num_reviews)
+    negative = np.bincount(review_of_token, weights=np.clip(token_scores, None, 0), minlength=num_reviews)
+
+    # Per-review max/min sentence score (sentences of a review are contiguous)
+    num_sentences = np.bincount(review_of_sentence, minlength=num_reviews)
+    max_sentence = np.full(num_reviews, np.nan)
+    min_sentence = np.full(num_reviews, np.nan)
+    has_sentences = np.flatnonzero(num_sentences)
+    if len(has_sentences):
+        starts = np.searchsorted(review_of_sentence, has_sentences)
+        max_sentence[has_sentences] = np.maximum.reduceat(sentence_scores, starts)
+        min_sentence[has_sentences] = np.minimum.reduceat(sentence_scores, starts)
+
+    return pd.DataFrame({
+        'num_sentences': num_sentences,
+        'total_score': total,
+        'positive_score': positive,
+        'negative_score': negative,
+        'max_sentence_score': max_sentence,
+        'min_sentence_score': min_sentence,
+    })
+
+
+def score_dataset(app_id):
+    """Score every review of an app's dataset, one row per review (see SCORE_COLUMNS)"""
+    dataset = review_store.get_dataset(app_id)
+    scores = score_texts(dataset.text('review_text'))
+    scores.insert(0, 'review_id', np.asarray(dataset.column('review_id')))
+    scores.insert(1, 'recommended', np.asarray(dataset.column('recommended')))
+    return scores[SCORE_COLUMNS]
+
+
+def _remember_scores(app_id, dataset_version, lexicon_version, scores):
+    with _scores_lock:
+        _scores_cache[app_id] = (dataset_version, lexicon_version, scores)
+        _scores_cache.move_to_end(app_id)
+        while len(_scores_cache) > MAX_CACHED_SCORES:
+            _scores_cache.popitem(last=False)
+
+
+def load_dataset_scores(app_id):
+    """
+    The app's scores if they are already in memory or in an up-to-date score
+    file, else None (nothing is scored here) - Called in main.py.
+    Raises FileNotFoundError if the app has no dataset.
+    """
+    app_id = str(app_id)
+    dataset = review_store.get_dataset(app_id)
+    lexicon_version = sentiment_dict.get_lexicon().version
+    with _scores_lock:
+        cached = _scores_cache.get(app_id)
+        if cached and cached[0] == dataset.version and cached[1] == lexicon_version:
+            _scores_cache.move_to_end(app_id)
+            return cached[2]
+
+    stored = read_score_file(app_id)
+    if stored is None:
+        return None
+    scores, info = stored
+    if info.get("built_from") != dataset.fingerprint or info.get("lexicon_version") != lexicon_version:
+        return None
+    _remember_scores(app_id, dataset.version, lexicon_version, scores)
+    return scores
+
+
+def get_dataset_scores(app_id):
+    """
+    load_dataset_scores, or else score the whole dataset and keep the result
+    in memory and in the score file - Called by jobs and review_index
+    """
+    app_id = str(app_id)
+    scores = load_dataset_scores(app_id)
+    if scores is not None:
+        return scores
+    dataset = review_store.get_dataset(app_id)
+    lexicon_version = sentiment_dict.get_lexicon().version
+    scores = score_dataset(app_id)
+    write_score_file(app_id, scores, dataset.fingerprint, lexicon_version)
+    _remember_scores(app_id, dataset.version, lexicon_version, scores)
+    return scores
+
+
+def compare_with_recommended(scores):
+    """How well the lexicon score agrees with the reviewer's recommended flag"""
+    recommended = scores['recommended'].astype(bool)
+    total = scores['total_score']
+    scored = total != 0
+    predicted = total > 0
+    agreement = (predicted[scored] == recommended[scored]).mean() if scored.any() else 0.0
+    correlation = np.corrcoef(total, recommended.astype(int))[0, 1] if len(scores) > 1 else float('nan')
+    return {
+        "reviews": int(len(scores)),
+        "neutral_reviews": int((~scored).sum()),
+        "agreement_rate": round(float(agreement), 4),
+        "true_positive": int((predicted & recommended & scored).sum()),
+        "false_positive": int((predicted & ~recommended & scored).sum()),
+        "true_negative": int((~predicted & ~recommended & scored).sum()),
+        "false_negative": int((~predicted & recommended & scored).sum()),
+        "mean_score_recommended": round(float(total[recommended].mean()), 4) if recommended.any() else 0.0,
+        "mean_score_not_recommended": round(float(total[~recommended].mean()), 4) if (~recommended).any() else 0.0,
+        "correlation": None if np.isnan(correlation) else round(float(correlation), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every review of a Steam review dataset")
+    parser.add_argument("app_id", help="Steam app id (reads data/steam_reviews_<app_id>.xlsx)")
+    parser.add_argument("--output", help="Write the per-review scores to this csv file")
+    args = parser.parse_args()
+
+    start = time.time()
+    scores = score_dataset(args.app_id)
+    print(f"Scored {len(scores):,} reviews in {time.time() - start:.2f}s")
+    for key, value in compare_with_recommended(scores).items():
+        print(f"  {key}: {value}")
+
+    if args.output:
+        scores.to_csv(args.output, index=False)
+        print(f"Scores saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
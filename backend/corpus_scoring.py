@@ -0,0 +1,155 @@
+"""
+Corpus Scoring
+Scores the reviews of many apps on all CPU cores.
+Each app's reviews are cut into chunks of rows, the chunks are scored by a
+process pool (wordsegment and the regex work hold the GIL, so threads do not
+help) and the results are written to one score file per app
+(bulk_scoring.write_score_file, read back by the /bulkScores endpoint).
+
+Usage:
+    python backend/corpus_scoring.py                 (every data/steam_reviews_*.xlsx)
+    python backend/corpus_scoring.py 315210 730 --workers 4 --chunk-size 500
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import bulk_scoring
+import review_store
+import reviewMethods
+import sentiment_dict
+
+DEFAULT_CHUNK_SIZE = 500
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+def available_app_ids():
+    """Every app that has a steam_reviews_<app_id>.xlsx in data/"""
+    app_ids = []
+    for path in glob.glob(os.path.join(review_store.DATA_DIR, "steam_reviews_*.xlsx")):
+        match = re.fullmatch(r"steam_reviews_(\d+)\.xlsx", os.path.basename(path))
+        if match:
+            app_ids.append(match.group(1))
+    return sorted(app_ids, key=int)
+
+
+def _init_worker():
+    """Runs once in every worker process: load the lexicon and segmenter before any chunk arrives"""
+    sentiment_dict.get_lexicon()
+    reviewMethods.load_segmenter()
+    reviewMethods._get_fast_path_words()
+
+
+def _score_chunk(app_id, start, stop):
+    """Score rows [start, stop) of an app; the worker reads them straight from the columnar store"""
+    dataset = review_store.get_dataset(app_id)
+    rows = range(start, stop)
+    scores = bulk_scoring.score_texts(dataset.text('review_text', rows))
+    scores.insert(0, 'review_id', np.array(dataset.column('review_id')[start:stop]))
+    scores.insert(1, 'recommended', np.array(dataset.column('recommended')[start:stop]))
+    return scores[bulk_scoring.SCORE_COLUMNS]
+
+
+def _print_progress(app_id, chunks_done, chunks_total, reviews_done, elapsed):
+    rate = reviews_done / elapsed if elapsed > 0 else 0.0
+    print(f"[{app_id}] {chunks_done}/{chunks_total} chunks, {reviews_done:,} reviews ({rate:,.0f} reviews/s)")
+
+
+def score_apps(app_ids, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, output_dir=bulk_scoring.SCORES_DIR,
+               progress=_print_progress):
+    """
+    Score every review of the given apps with a pool of `workers` processes
+    (default: one per CPU). Rows are always written in dataset order, whatever
+    order the chunks finish in. Returns {app_id: score file path}.
+    progress(app_id, chunks_done, chunks_total, reviews_done, elapsed) is called after every chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    app_ids = [str(app_id) for app_id in app_ids]
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Convert any new workbooks up front so workers only ever open the columnar copy
+    chunks = {}
+    fingerprints = {}
+    for app_id in app_ids:
+        dataset = review_store.get_dataset(app_id)
+        num_rows = len(dataset)
+        fingerprints[app_id] = dataset.fingerprint
+        chunks[app_id] = [(start, min(start + chunk_size, num_rows)) for start in range(0, num_rows, chunk_size)]
+
+    results = {app_id: [None] * len(chunks[app_id]) for app_id in app_ids}
+    chunks_done = {app_id: 0 for app_id in app_ids}
+    reviews_done = {app_id: 0 for app_id in app_ids}
+    output_paths = {}
+    lexicon_version = sentiment_dict.get_lexicon().version
+    start_time = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {}
+        for app_id in app_ids:
+            for chunk_number, (start, stop) in enumerate(chunks[app_id]):
+                future = pool.submit(_score_chunk, app_id, start, stop)
+                futures[future] = (app_id, chunk_number, stop - start)
+
+        for future in as_completed(futures):
+            app_id, chunk_number, size = futures[future]
+            results[app_id][chunk_number] = future.result()
+            chunks_done[app_id] += 1
+            reviews_done[app_id] += size
+            if progress:
+                progress(app_id, chunks_done[app_id], len(chunks[app_id]), reviews_done[app_id],
+                         time.time() - start_time)
+
+            # Write an app's file as soon as its last chunk is in
+            if chunks_done[app_id] == len(chunks[app_id]):
+                output_paths[app_id] = _write_scores(app_id, results.pop(app_id), fingerprints[app_id],
+                                                     lexicon_version, output_dir)
+
+    # Apps without any reviews never get a chunk
+    for app_id in app_ids:
+        if app_id not in output_paths:
+            output_paths[app_id] = _write_scores(app_id, results.pop(app_id, []), fingerprints[app_id],
+                                                 lexicon_version, output_dir)
+    return output_paths
+
+
+def _write_scores(app_id, chunk_results, built_from, lexicon_version, output_dir):
+    if chunk_results:
+        scores = pd.concat(chunk_results, ignore_index=True)
+    else:
+        scores = pd.DataFrame(columns=bulk_scoring.SCORE_COLUMNS)
+    return bulk_scoring.write_score_file(app_id, scores, built_from, lexicon_version, output_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score the reviews of many apps on all CPU cores")
+    parser.add_argument("app_ids", nargs="*", help="Steam app ids (default: every dataset in data/)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Reviews per chunk")
+    parser.add_argument("--output-dir", default=bulk_scoring.SCORES_DIR, help="Where the per-app score files go")
+    args = parser.parse_args()
+
+    app_ids = args.app_ids or available_app_ids()
+    if not app_ids:
+        print("No datasets found in data/")
+        return
+
+    start = time.time()
+    output_paths = score_apps(app_ids, workers=args.workers, chunk_size=args.chunk_size,
+                              output_dir=args.output_dir)
+    print(f"Scored {len(app_ids)} app(s) in {time.time() - start:.2f}s")
+    for app_id, path in output_paths.items():
+        print(f"  {app_id}: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,46 +3,185 @@ Steam Reviews Sentiment Analysis by Playtime
 Creates comprehensive visualizations showing sentiment flow based on playtime hours
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
+import glob
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aggregate_store
+import review_store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHART_DIR = os.path.normpath(os.path.join(BASE_DIR, "..", "frontend", "static", "charts"))
+CHART_URL = "/static/charts"
+
+FULL_DPI = 300
+PREVIEW_DPI = 72
+
+# Playtime bins (in hours) shared by the JSON summary, the rendered chart and the aggregate store
+PLAYTIME_BINS = aggregate_store.PLAYTIME_BINS
+PLAYTIME_LABELS = aggregate_store.PLAYTIME_LABELS
+# Precomputed per dataset version, stored inside the dataset's columnar directory
+# (the version suffix changes whenever the summary gains fields)
+PLAYTIME_STATS_FILE = "playtime_stats.v2.json"
+# How long a failed render is reported before the chart is tried again (seconds)
+RENDER_FAILURE_TTL = 60
 
 # =============================================================================
 # ACTIVE CODE - Currently used functions
 # =============================================================================
 
-def create_sentiment_playtime_visualization(file_id):
-    """Create comprehensive sentiment analysis visualization"""
-    
-    # Read and prepare the data
-    print("Loading Steam reviews data...")
-    df = pd.read_excel(file_id)
-    
+# One background thread renders charts, so requests never wait on matplotlib
+_render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chart-render")
+_in_flight = {}     # chart file name -> Future, so identical requests share one render
+_in_flight_lock = threading.Lock()
+_failures = {}      # chart file name -> (time.monotonic() of the failure, error message)
+
+
+class ChartRenderError(Exception):
+    """Raised by request_chart while the chart's last render failed less than RENDER_FAILURE_TTL ago"""
+
+
+def chart_file_name(app_id, fingerprint, dpi):
+    """Charts are keyed by (app_id, dataset hash, dpi), one file per combination"""
+    return f"sentiment_playtime_{app_id}_{fingerprint[:12]}_{dpi}.png"
+
+
+def request_chart(app_id, preview=False):
+    """
+    Return the URL of the app's chart if it has already been rendered for the
+    current dataset, otherwise queue a render and return None.
+    Asking for the preview also queues the full chart right behind it.
+    Raises FileNotFoundError if the app has no dataset and ChartRenderError
+    if the chart's last render failed recently - Called in main.py
+    """
+    app_id = str(app_id)
+    dataset = review_store.get_dataset(app_id)
+    url = _chart_url_or_queue(app_id, dataset.fingerprint, PREVIEW_DPI if preview else FULL_DPI)
+    if preview:
+        _chart_url_or_queue(app_id, dataset.fingerprint, FULL_DPI)
+    return url
+
+
+def _chart_url_or_queue(app_id, fingerprint, dpi):
+    file_name = chart_file_name(app_id, fingerprint, dpi)
+    if os.path.exists(os.path.join(CHART_DIR, file_name)):
+        return f"{CHART_URL}/{file_name}"
+
+    with _in_flight_lock:
+        failure = _failures.get(file_name)
+        if failure is not None:
+            failed_at, error = failure
+            if time.monotonic() - failed_at < RENDER_FAILURE_TTL:
+                raise ChartRenderError(error)
+            del _failures[file_name]
+        if file_name not in _in_flight:
+            _in_flight[file_name] = _render_pool.submit(_render_in_background, app_id, dpi, file_name)
+    return None
+
+
+def _render_in_background(app_id, dpi, file_name):
+    try:
+        create_sentiment_playtime_visualization(app_id, dpi=dpi)
+    except Exception as e:
+        print(f"ERROR rendering chart for app {app_id}: {e}")
+        # Polls report the failure instead of queueing the same render again
+        with _in_flight_lock:
+            _failures[file_name] = (time.monotonic(), f"Rendering the chart failed: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(file_name, None)
+
+
+def compute_playtime_stats(df):
+    """
+    Recommended ratio, review count, recommended count and average hours per playtime bin.
+    df needs the playtime_at_review_h (minutes) and recommended columns;
+    bins without any reviews are left out.
+    """
+    import pandas as pd
     # Convert playtime from minutes to hours
-    df['playtime_hours'] = df['playtime_at_review_h'] / 60
-    df['sentiment_score'] = df['recommended'].astype(int)
-    
-    # Create playtime bins (in hours)
-    playtime_bins = [0, 1, 5, 10, 25, 50, 100, 500, 1200]
-    playtime_labels = ['0-1h', '1-5h', '5-10h', '10-25h', '25-50h', '50-100h', '100-500h', '500h+']
-    
-    df['playtime_bin'] = pd.cut(df['playtime_hours'], 
-                                bins=playtime_bins, 
-                                labels=playtime_labels, 
-                                right=False)
-    
+    binned = pd.DataFrame({
+        'playtime_hours': df['playtime_at_review_h'] / 60,
+        'sentiment_score': df['recommended'].astype(int),
+    })
+    binned['playtime_bin'] = pd.cut(binned['playtime_hours'],
+                                    bins=PLAYTIME_BINS,
+                                    labels=PLAYTIME_LABELS,
+                                    right=False)
+
     # Calculate sentiment statistics
-    sentiment_stats = df.groupby('playtime_bin', observed=True).agg({
-        'sentiment_score': ['mean', 'count'],
+    sentiment_stats = binned.groupby('playtime_bin', observed=True).agg({
+        'sentiment_score': ['mean', 'count', 'sum'],
         'playtime_hours': 'mean'
     }).round(3)
+
+    sentiment_stats.columns = ['positive_ratio', 'review_count', 'positive_count', 'avg_hours']
+    return sentiment_stats.reset_index()
+
+
+def get_playtime_stats(app_id):
+    """
+    JSON-ready playtime summary of an app, computed once per dataset version
+    and kept next to the columnar data. Raises FileNotFoundError if the app
+    has no dataset - Called in main.py
+    """
+    dataset = review_store.get_dataset(app_id)
+    stats_path = os.path.join(dataset.directory, PLAYTIME_STATS_FILE)
+    try:
+        with open(stats_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    df = dataset.to_dataframe(columns=['playtime_at_review_h', 'recommended'])
+    sentiment_stats = compute_playtime_stats(df)
+    summary = {
+        "app_id": dataset.app_id,
+        "fingerprint": dataset.fingerprint,
+        "total_reviews": len(df),
+        "overall_positive_ratio": round(float(df['recommended'].astype(int).mean()), 3) if len(df) else 0.0,
+        "bins": [{
+            "playtime_bin": str(row.playtime_bin),
+            "positive_ratio": float(row.positive_ratio),
+            "review_count": int(row.review_count),
+            # Counts behind the positive vs negative chart
+            "positive_count": int(row.positive_count),
+            "negative_count": int(row.review_count - row.positive_count),
+            "avg_hours": float(row.avg_hours),
+        } for row in sentiment_stats.itertuples(index=False)],
+    }
+
+    # Written under a temporary name first so a half-written file is never read
+    tmp_path = f"{stats_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, stats_path)
+    except OSError as e:
+        print(f"WARNING: could not save playtime stats for app {app_id}: {e}")
+    return summary
+
+
+def create_sentiment_playtime_visualization(app_id, dpi=FULL_DPI):
+    """Create comprehensive sentiment analysis visualization (renders synchronously, returns the file path)"""
     
-    sentiment_stats.columns = ['positive_ratio', 'review_count', 'avg_hours']
-    sentiment_stats = sentiment_stats.reset_index()
+    # Read and prepare the data (from the columnar review store, not the .xlsx)
+    print("Loading Steam reviews data...")
+    dataset = review_store.get_dataset(app_id)
+    df = dataset.to_dataframe(columns=['playtime_at_review_h', 'recommended'])
+    
+    sentiment_stats = compute_playtime_stats(df)
     
+    # matplotlib is only imported once the first chart is drawn. The object-oriented
+    # Figure API (no pyplot) is safe to use from the background render thread
+    from matplotlib.figure import Figure
+
     # Create the visualization
-    plt.style.use('default')
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig = Figure(figsize=(16, 12))
+    axes = fig.subplots(2, 2)
     
     # Plot 1: Bar Chart - Recommended Ratio
     ax1 = axes[0, 0]
@@ -112,19 +251,32 @@ def create_sentiment_playtime_visualization(file_id):
     for ax in axes.flat:
         ax.tick_params(axis='x', rotation=45)
     
-    plt.tight_layout()
+    fig.tight_layout()
     
-    # Save the visualization
-    output_path = 'frontend/static/css/sentiment_playtime_analysis.png'
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    # Save the visualization to this app's own file (written under a temporary name
+    # first so a half-written chart is never served)
+    os.makedirs(CHART_DIR, exist_ok=True)
+    file_name = chart_file_name(app_id, dataset.fingerprint, dpi)
+    output_path = os.path.join(CHART_DIR, file_name)
+    tmp_path = f"{output_path}.{threading.get_ident()}.tmp.png"
+    fig.savefig(tmp_path, dpi=dpi, bbox_inches='tight')
+    os.replace(tmp_path, output_path)
     print(f"Visualization saved to: {output_path}")
+
+    # Charts rendered from older versions of this dataset are never served again
+    for old_chart in glob.glob(os.path.join(CHART_DIR, f"sentiment_playtime_{app_id}_*_{dpi}.png")):
+        if os.path.basename(old_chart) != file_name:
+            try:
+                os.remove(old_chart)
+            except OSError:
+                pass
     
     # Display key insights
     print("\n" + "="*60)
     print("SENTIMENT ANALYSIS INSIGHTS")
     print("="*60)
     print(f"Total reviews analyzed: {len(df):,}")
-    print(f"Overall positive sentiment: {df['sentiment_score'].mean():.1%}")
+    print(f"Overall positive sentiment: {df['recommended'].astype(int).mean():.1%}")
     print(f"Playtime converted from minutes to hours")
     
     print("\nKey Findings:")
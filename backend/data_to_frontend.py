@@ -1,35 +1,96 @@
-import pandas as pd
-import re
+import numpy as np
+
+import review_store
+import text_normalizer
+
+# Default number of random reviews shown on the dashboard
+SAMPLE_SIZE = 10
+# Rows decoded at a time while streaming a page
+STREAM_BATCH_SIZE = 500
 
 # =============================================================================
 # ACTIVE CODE - Currently used functions
 # =============================================================================
 
-currentDataframe = None
+# Clean one raw review for display (Zacc's cleaning steps, used by get_reviews and get_review)
+def clean_review_text(review_text):
+    if not isinstance(review_text, str):
+        review_text = '' # Empty reviews are read back as NaN
+    return text_normalizer.clean_display_text(review_text)
 
-# Zacc's Code - Called in main.py
-def get_reviews():
-    review_text_column = currentDataframe['review_text']
-    review_ID_column = currentDataframe['review_id']
+# Zacc's Code - Clean every review of a DataFrame (review_id, review_text)
+def get_reviews(dataframe):
+    review_text_column = dataframe['review_text']
+    review_ID_column = dataframe['review_id']
     output_list = []
 
     for eachReview in range(len(review_text_column)):
-        review_text = review_text_column.iloc[eachReview]
-        review_text = re.sub('_x000D_', '', review_text)
-        review_text = re.sub('\n', '', review_text)
-        review_text = re.sub(r'\s+', ' ', review_text).strip() # Replace multiple spaces with a single space
-
         output_list.append({
             "review_id": review_ID_column.iloc[eachReview],
-            "review_text": review_text
+            "review_text": clean_review_text(review_text_column.iloc[eachReview])
         })
-    
+
     return output_list
 
-# Get raw review to display to users (Zacc's & Mus' Code) - Called in main.py
-def get_all_reviews(file_path):
-    df = pd.read_excel(file_path)
-    global currentDataframe 
-    currentDataframe = df.sample(10) # Random 10 reviews
-    output = get_reviews()
-    return output
\ No newline at end of file
+# Look up a single review by its ID through the per-app index - Called in main.py
+# Only the matching row is decoded and cleaned, returns None if the ID is unknown
+def get_review(app_id, review_id):
+    dataset = review_store.get_dataset(app_id)
+    row = dataset.row_of(review_id)
+    if row is None:
+        return None
+    return {
+        "review_id": int(dataset.column('review_id')[row]),
+        "review_text": clean_review_text(dataset.text('review_text', [row])[0])
+    }
+
+# Row positions matching the /getReviews filters, computed on the columnar store
+# (None means every row). Playtime bounds are in hours, the stored column is in minutes
+def filter_rows(dataset, recommended=None, language=None, min_playtime=None, max_playtime=None):
+    mask = None
+
+    def combine(condition):
+        return condition if mask is None else mask & condition
+
+    if recommended is not None:
+        mask = combine(np.asarray(dataset.column('recommended')) == bool(recommended))
+    if language is not None:
+        codes, labels = dataset.categories('language')
+        wanted = labels.index(language) if language in labels else -2 # -2 matches nothing
+        mask = combine(codes == wanted)
+    if min_playtime is not None or max_playtime is not None:
+        playtime = np.asarray(dataset.column('playtime_at_review_h'))
+        if min_playtime is not None:
+            mask = combine(playtime >= min_playtime * 60)
+        if max_playtime is not None:
+            mask = combine(playtime < max_playtime * 60)
+    return None if mask is None else np.flatnonzero(mask)
+
+
+# Decode and clean only the given rows
+def reviews_at(dataset, rows):
+    ids = dataset.column('review_id')
+    texts = dataset.text('review_text', rows)
+    return [{"review_id": int(ids[row]), "review_text": clean_review_text(text)}
+            for row, text in zip(rows, texts)]
+
+
+# One page (offset/limit) or a random sample of the matching rows - Called in main.py
+# Returns (dataset, number of matching reviews, row positions to show); no review text is read here
+def select_rows(app_id, offset=0, limit=SAMPLE_SIZE, sample=False, **filters):
+    dataset = review_store.get_dataset(app_id)
+    rows = filter_rows(dataset, **filters)
+    matching = len(dataset) if rows is None else len(rows)
+    if sample:
+        # Pick row offsets first, so only the sampled rows are ever decoded
+        picked = np.random.default_rng().choice(matching, size=min(limit, matching), replace=False)
+        picked = np.sort(picked)
+    else:
+        picked = np.arange(offset, min(offset + limit, matching))
+    return dataset, matching, (picked if rows is None else rows[picked]).tolist()
+
+
+# Yield reviews in batches so a large page is never held in memory at once (NDJSON streaming)
+def iter_reviews(dataset, rows):
+    for start in range(0, len(rows), STREAM_BATCH_SIZE):
+        yield from reviews_at(dataset, rows[start:start + STREAM_BATCH_SIZE])
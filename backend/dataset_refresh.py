@@ -0,0 +1,256 @@
+"""
+Dataset Refresh
+Brings data/steam_reviews_<app_id>.xlsx up to date without re-downloading it.
+Reviews are paged newest first (filter='recent') only until a page reaches a
+review we already have, so a daily refresh costs a handful of requests.
+The new rows are merged into the workbook, the aggregate store and the score
+file; everything keyed by the dataset version (columnar copy, playtime stats,
+charts, cached analyses) rebuilds itself on next use.
+The score file is updated before the new workbook is swapped in and the
+aggregate store recounts a workbook it was not built from, so a refresh that
+fails part way can simply be run again.
+
+Usage:
+    python backend/dataset_refresh.py 315210 --language english
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregate_store
+import bulk_scoring
+import fetch_steam_data
+import review_store
+import sentiment_dict
+
+REFRESH_DIR = os.path.join(review_store.DATA_DIR, "refresh")
+
+# Steam ids have 17 digits and xlsxwriter writes numbers with 16 significant
+# digits, so they are written as text (pandas reads the digits back as int64).
+# review_id is a nullable Int64 from reviews_to_dataframe, small enough to stay
+# a number, and is compared as int64 throughout
+TEXT_ID_COLUMNS = ['steam_id']
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+def _state_path(app_id):
+    return os.path.join(REFRESH_DIR, f"{app_id}.json")
+
+
+def load_refresh_state(app_id):
+    """What the last refresh recorded for an app (newest timestamp_created etc.), or None"""
+    try:
+        with open(_state_path(app_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_refresh_state(app_id, state):
+    os.makedirs(REFRESH_DIR, exist_ok=True)
+    path = _state_path(app_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _newest_timestamp(app_id, dataset):
+    """timestamp_created of the newest stored review, from the last refresh or else from the dataset"""
+    state = load_refresh_state(app_id)
+    if state and state.get("newest_timestamp_created"):
+        return state["newest_timestamp_created"]
+    if not len(dataset):
+        return None
+    # date_of_review was written with datetime.fromtimestamp, so it is local time
+    newest = pd.Timestamp(np.asarray(dataset.column('date_of_review')).max())
+    return int(newest.to_pydatetime().timestamp())
+
+
+def fetch_new_reviews(app_id, known_ids, newest_timestamp, fetcher, language='english', num_per_page=100):
+    """
+    Page through the most recent reviews until a page contains a review that is
+    already stored (or older than newest_timestamp). Returns (new raw reviews, pages fetched).
+    """
+    new_reviews = []
+    seen = set()
+    pages = 0
+    for batch, _ in fetcher.iter_pages(app_id, filter_by='recent', language=language,
+                                       num_per_page=num_per_page):
+        pages += 1
+        reached_known = False
+        for review in batch:
+            review_id = int(review['recommendationid'])
+            if review_id in known_ids:
+                reached_known = True
+                continue
+            if newest_timestamp and review['timestamp_created'] < newest_timestamp:
+                reached_known = True
+            if review_id not in seen:
+                seen.add(review_id)
+                new_reviews.append(review)
+        if reached_known:
+            break
+    return new_reviews, pages
+
+
+def _match_columns(new_df, existing):
+    """Give freshly fetched rows the workbook's column names, order and dtypes"""
+    # reviews_to_dataframe calls the playtime column by its real unit
+    new_df = new_df.rename(columns={'playtime_at_review_m': 'playtime_at_review_h'})
+    for name in existing.columns:
+        if pd.api.types.is_bool_dtype(existing[name]):
+            new_df[name] = new_df[name].fillna(False).astype(bool)
+        elif pd.api.types.is_numeric_dtype(existing[name]):
+            new_df[name] = pd.to_numeric(new_df[name], errors='coerce')
+            if pd.api.types.is_integer_dtype(existing[name]) and new_df[name].notna().all():
+                new_df[name] = new_df[name].astype(existing[name].dtype)
+    return new_df[list(existing.columns)]
+
+
+def _ids_as_text(df):
+    for name in TEXT_ID_COLUMNS:
+        df[name] = df[name].astype(str)
+    return df
+
+
+def _write_workbook(df, path, before_swap=None):
+    """
+    Write the merged dataset under a temporary name, then swap it in.
+    before_swap(tmp_path) runs once the new workbook is complete but not yet in place;
+    if it raises, the old workbook is left untouched
+    """
+    tmp_path = path + ".tmp.xlsx"
+    try:
+        # Same writer settings as fetch_steam_data
+        with pd.ExcelWriter(
+            tmp_path,
+            engine='xlsxwriter',
+            engine_kwargs={'options': {'strings_to_formulas': False}},
+            datetime_format='yyyy-mm-dd hh:mm:ss'
+        ) as writer:
+            df.to_excel(writer, index=False)
+        if before_swap is not None:
+            before_swap(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_dataset(app_id, df):
+    """
+    Store freshly fetched reviews (reviews_to_dataframe frames) as the app's
+    workbook, newest first and without repeated reviews, then count them in
+    the aggregate store. Returns the number of reviews written - Called by jobs
+    """
+    df = df.rename(columns={'playtime_at_review_m': 'playtime_at_review_h'})
+    df = df.drop_duplicates('review_id').sort_values('date_of_review', ascending=False, kind='stable')
+    df = _ids_as_text(df.reset_index(drop=True))
+    _write_workbook(df, review_store.source_path(app_id))
+    # A new workbook, any counters kept for the app describe some other one
+    aggregate_store.rebuild(app_id)
+    return len(df)
+
+
+def _update_scores(app_id, merged, built_from):
+    """
+    Bring an existing score file in line with the merged workbook. Rows are
+    reused by review id and every review the file lacks is scored: the new
+    ones, and any it never had because the workbook was replaced some other way
+    (a full re-fetch, a new export). Scores from another lexicon are all redone.
+    """
+    stored = bulk_scoring.read_score_file(app_id)
+    if stored is None:
+        return
+    scores, info = stored
+    lexicon_version = sentiment_dict.get_lexicon().version
+    if info.get("lexicon_version") != lexicon_version:
+        scores = scores.iloc[:0]
+    review_ids = merged['review_id'].astype(np.int64)
+    missing = ~review_ids.isin(scores['review_id']).to_numpy()
+    if missing.any():
+        new_rows = merged[missing]
+        new_scores = bulk_scoring.score_texts(new_rows['review_text'].tolist())
+        new_scores.insert(0, 'review_id', review_ids[missing].to_numpy())
+        new_scores.insert(1, 'recommended', new_rows['recommended'].to_numpy())
+        scores = pd.concat([new_scores[bulk_scoring.SCORE_COLUMNS], scores], ignore_index=True)
+    # Same row order as the merged workbook, reviews no longer in it are dropped
+    scores = scores.drop_duplicates('review_id').set_index('review_id').loc[review_ids.to_numpy()].reset_index()
+    bulk_scoring.write_score_file(app_id, scores, built_from, lexicon_version)
+
+
+def refresh_dataset(app_id, language='english', num_per_page=100, fetcher=None):
+    """
+    Fetch the reviews posted since the last refresh and merge them into the
+    app's workbook and derived files. The stored recommendationids are the
+    dataset's review_id column, so nothing extra has to be kept in sync.
+    Returns a summary dict. Raises FileNotFoundError if the app has no workbook yet.
+    """
+    app_id = str(app_id)
+    start = time.time()
+    dataset = review_store.get_dataset(app_id)
+    known_ids = set(np.asarray(dataset.column('review_id')).tolist())
+    newest_timestamp = _newest_timestamp(app_id, dataset)
+
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = fetch_steam_data.SteamReviewFetcher()
+    try:
+        raw, pages = fetch_new_reviews(app_id, known_ids, newest_timestamp, fetcher,
+                                       language=language, num_per_page=num_per_page)
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    if raw:
+        newest_timestamp = max([newest_timestamp or 0] + [review['timestamp_created'] for review in raw])
+        existing = _ids_as_text(dataset.to_dataframe())
+        new_rows = _ids_as_text(_match_columns(fetch_steam_data.reviews_to_dataframe(raw), existing))
+        merged = pd.concat([new_rows, existing], ignore_index=True)
+        merged = merged.sort_values('date_of_review', ascending=False, kind='stable').reset_index(drop=True)
+
+        # Scores go first and are keyed by review id: if the swap never happens,
+        # the next refresh reuses them for whatever workbook is in place then
+        _write_workbook(merged, review_store.source_path(app_id), before_swap=lambda tmp_path: _update_scores(
+            app_id, merged, review_store.source_fingerprint(app_id, tmp_path)))
+        # Counters of the workbook before the merge only need the new rows (counters
+        # left behind by a failure here are recounted, they remember their workbook)
+        aggregate_store.add_reviews(app_id, new_rows, previous_fingerprint=dataset.fingerprint)
+        total_reviews = len(merged)
+    else:
+        total_reviews = len(dataset)
+
+    summary = {
+        "app_id": app_id,
+        "new_reviews": len(raw),
+        "pages_fetched": pages,
+        "total_reviews": total_reviews,
+        "newest_timestamp_created": newest_timestamp,
+        "last_refresh": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _save_refresh_state(app_id, summary)
+    print(f"Refreshed app {app_id}: {len(raw)} new reviews from {pages} page(s) in {time.time() - start:.2f}s")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the newest Steam reviews to an existing dataset")
+    parser.add_argument("app_id", help="Steam app id (updates data/steam_reviews_<app_id>.xlsx)")
+    parser.add_argument("--language", default="english", help="Review language the dataset was fetched with")
+    parser.add_argument("--num-per-page", type=int, default=100, help="Reviews per request (max 100)")
+    args = parser.parse_args()
+
+    summary = refresh_dataset(args.app_id, language=args.language, num_per_page=args.num_per_page)
+    for key, value in summary.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,64 +1,379 @@
+import glob
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import numpy as np
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 import time
 
+import aggregate_store
+import review_store
+
+# Point this at a local stand-in server to test the fetcher without hitting Steam
+STEAM_REVIEWS_URL = "https://store.steampowered.com/appreviews/{app_id}"
+
+# Streaming mode: raw pages are appended to JSONL chunk files under data/raw/
+RAW_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "raw")
+REVIEWS_PER_CHUNK = 10000
+STREAM_STATE_FILE = "state.json"
+
+# Politeness and retry settings shared by every stream of a fetcher
+REQUESTS_PER_SECOND = 4
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0      # seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+REQUEST_TIMEOUT = 30
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
 # =============================================================================
 # ACTIVE CODE - Used to obtain review datasets
 # =============================================================================
 
+class StreamOptionsMismatch(ValueError):
+    """Raised when a stream directory already holds a fetch made with other options"""
+
+
+class RateLimiter:
+    """Spaces requests evenly so all threads together stay under requests_per_second"""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SteamReviewFetcher:
+    """
+    Fetches review pages through one pooled requests.Session.
+    Transient failures (429, 5xx, connection errors, timeouts) are retried with
+    exponential backoff and full jitter, every request passes one shared rate
+    limiter, and independent cursor streams run side by side in a thread pool
+    while each stream's cursor chain stays sequential.
+    Pass rate_limiter to share one limit between several fetchers, and session
+    to send the requests through another requests.Session (e.g. in tests).
+    """
+
+    def __init__(self, base_url=STEAM_REVIEWS_URL, max_workers=MAX_WORKERS,
+                 requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, timeout=REQUEST_TIMEOUT,
+                 rate_limiter=None, session=None):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_second)
+
+        # A session passed in belongs to the caller and is left open by close()
+        self._own_session = session is None
+        if session is not None:
+            self.session = session
+            return
+        # Keep-alive connections, one per worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry number attempt (Retry-After wins if the server sent one)"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get_page(self, app_id, params):
+        """GET one page of reviews as JSON, retrying transient failures"""
+        url = self.base_url.format(app_id=app_id)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            response = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            delay = self._backoff(attempt, response)
+            print(f"Retrying app {app_id} in {delay:.1f}s after: {error}")
+            time.sleep(delay)
+
+    def iter_pages(self, app_id, filter_by='all', language='all', day_range=30,
+                   review_type='all', purchase_type='all', num_per_page=100, cursor='*'):
+        """Yield (reviews, next cursor) for every page of one cursor stream, in order"""
+        params = {
+            'json': 1,
+            'filter': filter_by,
+            'language': language,
+            'day_range': day_range,
+            'review_type': review_type,
+            'purchase_type': purchase_type,
+            'num_per_page': num_per_page,
+            'cursor': cursor,
+        }
+        while True:
+            params['cursor'] = cursor
+            data = self.get_page(app_id, params)
+
+            batch = data.get('reviews', [])
+            if not batch:
+                break
+
+            cursor = data.get('cursor')
+            yield batch, cursor
+            # When Steam returns the same cursor twice or no cursor, we stop
+            if not cursor or cursor == params['cursor']:
+                break
+
+    def fetch_stream(self, app_id, **options):
+        """Every review of one cursor stream as a list of raw review dicts"""
+        reviews = []
+        for batch, _ in self.iter_pages(app_id, **options):
+            reviews.extend(batch)
+        return reviews
+
+    def fetch_many(self, streams):
+        """
+        Fetch several independent streams concurrently.
+        streams is a list of dicts with app_id plus any iter_pages option
+        (e.g. language or review_type); returns the review lists in the same order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="steam-fetch") as pool:
+            futures = [pool.submit(self.fetch_stream, **stream) for stream in streams]
+            return [future.result() for future in futures]
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+
 def fetch_steam_reviews(app_id,
                         filter_by='all',
                         language='all',
                         day_range=30,
                         review_type='all',
                         purchase_type='all',
-                        num_per_page=100):
+                        num_per_page=100,
+                        fetcher=None):
     """
     Fetches all Steam reviews for a given app_id, paging through cursors.
     Returns a list of raw review dicts and also times how long it takes 
     """
     start = time.time()
-    reviews = []
-    cursor = '*'
-
-    base_url = f"https://store.steampowered.com/appreviews/{app_id}"
-    params = {
-        'json': 1,
-        'filter': filter_by,
-        'language': language,
-        'day_range': day_range,
-        'review_type': review_type,
-        'purchase_type': purchase_type,
-        'num_per_page': num_per_page,
-        'cursor': cursor,
-    }
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = SteamReviewFetcher()
+    try:
+        reviews = fetcher.fetch_stream(app_id, filter_by=filter_by, language=language,
+                                       day_range=day_range, review_type=review_type,
+                                       purchase_type=purchase_type, num_per_page=num_per_page)
+    finally:
+        if own_fetcher:
+            fetcher.close()
 
-    while True:
-        params['cursor'] = cursor
-        resp = requests.get(base_url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
-
-        batch = data.get('reviews', [])
-        if not batch:
-            break
-
-        reviews.extend(batch)
-        cursor = data.get('cursor')
-        # When Steam returns the same cursor twice or no cursor, we stop
-        if not cursor or cursor == params['cursor']:
-            break
-        
     end = time.time()
     print("Time taken to fetch:", end - start)
     return reviews
 
 
+def stream_dir_for(app_id, filter_by='all', language='all', review_type='all', purchase_type='all'):
+    """Each distinct cursor stream gets its own directory of chunks"""
+    return os.path.join(RAW_DIR, f"{app_id}_{filter_by}_{language}_{review_type}_{purchase_type}")
+
+
+def _read_stream_state(directory):
+    try:
+        with open(os.path.join(directory, STREAM_STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_stream_state(directory, state):
+    path = os.path.join(directory, STREAM_STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _chunk_path(directory, chunk_number):
+    return os.path.join(directory, f"reviews-{chunk_number:05d}.jsonl")
+
+
+def stream_steam_reviews(app_id,
+                         filter_by='all',
+                         language='all',
+                         day_range=30,
+                         review_type='all',
+                         purchase_type='all',
+                         num_per_page=100,
+                         directory=None,
+                         fetcher=None):
+    """
+    Fetch reviews straight to disk: every page is appended to a JSONL chunk
+    file as soon as it arrives, so memory stays at about one page.
+    After each page the next cursor and the committed size of the chunk file
+    are saved in state.json. Running again with the same options resumes
+    from that cursor, and any half-written page after the last commit is cut off.
+    Returns the stream directory (read it back with iter_stream_reviews).
+    """
+    directory = directory or stream_dir_for(app_id, filter_by, language, review_type, purchase_type)
+    os.makedirs(directory, exist_ok=True)
+    options = {'app_id': str(app_id), 'filter_by': filter_by, 'language': language, 'day_range': day_range,
+               'review_type': review_type, 'purchase_type': purchase_type}
+
+    state = _read_stream_state(directory)
+    if state is not None and state['options'] != options:
+        raise StreamOptionsMismatch(f"{directory} holds a stream fetched with different options: {state['options']}")
+    if state is None:
+        state = {'options': options, 'cursor': '*', 'chunk': 1, 'chunk_bytes': 0,
+                 'pages': 0, 'reviews': 0, 'done': False}
+    if state['done']:
+        print(f"Stream already complete: {state['reviews']} reviews in {directory}")
+        return directory
+    if state['pages']:
+        print(f"Resuming after page {state['pages']} ({state['reviews']} reviews) from cursor {state['cursor']}")
+
+    start = time.time()
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = SteamReviewFetcher()
+    chunk_file = open(_chunk_path(directory, state['chunk']), "ab")
+    try:
+        # Drop whatever an interrupted run wrote after its last committed page
+        chunk_file.truncate(state['chunk_bytes'])
+        chunk_file.seek(state['chunk_bytes'])
+
+        for batch, cursor in fetcher.iter_pages(app_id, filter_by=filter_by, language=language,
+                                                day_range=day_range, review_type=review_type,
+                                                purchase_type=purchase_type, num_per_page=num_per_page,
+                                                cursor=state['cursor']):
+            chunk_file.write("".join(json.dumps(review) + "\n" for review in batch).encode("utf-8"))
+            chunk_file.flush()
+            os.fsync(chunk_file.fileno())
+
+            state['cursor'] = cursor
+            state['pages'] += 1
+            state['reviews'] += len(batch)
+            state['chunk_bytes'] = chunk_file.tell()
+            # Start a new chunk file once the current one is full
+            if state['reviews'] >= state['chunk'] * REVIEWS_PER_CHUNK:
+                chunk_file.close()
+                state['chunk'] += 1
+                state['chunk_bytes'] = 0
+                chunk_file = open(_chunk_path(directory, state['chunk']), "ab")
+            _write_stream_state(directory, state)
+
+        state['done'] = True
+        _write_stream_state(directory, state)
+    finally:
+        chunk_file.close()
+        if own_fetcher:
+            fetcher.close()
+
+    print(f"Streamed {state['reviews']} reviews to {directory} in {time.time() - start:.2f}s")
+    return directory
+
+
+def iter_stream_reviews(directory, reviews_per_frame=REVIEWS_PER_CHUNK):
+    """Read a streamed fetch back as reviews_to_dataframe frames of at most reviews_per_frame rows"""
+    batch = []
+    for path in sorted(glob.glob(os.path.join(directory, "reviews-*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= reviews_per_frame:
+                    yield reviews_to_dataframe(batch)
+                    batch = []
+    if batch:
+        yield reviews_to_dataframe(batch)
+
+
+# Arrow-backed strings need pyarrow; without it pandas' own string dtype is used
+STRING_DTYPE = pd.StringDtype("pyarrow") if importlib.util.find_spec("pyarrow") else pd.StringDtype("python")
+
+# review column -> (field of the review or of its author, dtype)
+REVIEW_FIELDS = {
+    'review_id':              ('recommendationid', 'Int64'),
+    'steam_id':               ('author.steamid', STRING_DTYPE),
+    'num_games_owned':        ('author.num_games_owned', 'Int32'),
+    'num_reviews_by_user':    ('author.num_reviews', 'Int32'),
+    'playtime_at_review_m':   ('author.playtime_at_review', 'Int32'),
+    'language':               ('language', 'category'),
+    'date_of_review':         ('timestamp_created', None),
+    'recommended':            ('voted_up', 'boolean'),
+    'votes_helpful':          ('votes_up', 'Int32'),
+    'votes_funny':            ('votes_funny', 'Int32'),
+    'comment_count':          ('comment_count', 'Int32'),
+    'steam_purchase':         ('steam_purchase', 'boolean'),
+    'received_for_free':      ('received_for_free', 'boolean'),
+    'weighted_vote_score':    ('weighted_vote_score', 'float32'),
+    'review_text':            ('review', STRING_DTYPE),
+}
+
+
+def _local_datetimes(timestamps):
+    """
+    Vectorized datetime.fromtimestamp (local wall-clock time): the UTC offset
+    is looked up once per distinct hour instead of once per review
+    """
+    seconds = np.asarray(timestamps, dtype=np.int64)
+    hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64)
+    return pd.Series(pd.to_datetime(seconds + offsets[inverse].reshape(-1), unit='s'))
+
+
 def reviews_to_dataframe(raw_reviews):
     """
     Maps the raw review JSON into a pandas DataFrame with selected fields.
+    Each column is pulled out of the batch in one pass and given a compact
+    dtype: nullable Int32 counts and booleans, float32 scores, categorical
+    language and (Arrow-backed when available) strings.
     """
+    authors = [r.get('author') or {} for r in raw_reviews]
+    columns = {}
+    for name, (field, dtype) in REVIEW_FIELDS.items():
+        if field.startswith('author.'):
+            key = field[len('author.'):]
+            values = [a.get(key) for a in authors]
+        else:
+            values = [r.get(field) for r in raw_reviews]
+
+        if name == 'date_of_review':
+            columns[name] = _local_datetimes(values)
+        elif dtype in ('Int32', 'Int64', 'float32'):
+            # Steam sends weighted_vote_score as a string
+            columns[name] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype(dtype)
+        else:
+            columns[name] = pd.Series(values, dtype=object).astype(dtype)
+    return pd.DataFrame(columns, columns=list(REVIEW_FIELDS))
+
+
+def _reviews_to_records_dataframe(raw_reviews):
+    """The previous dict-per-review conversion, kept only as the baseline for memory_report"""
     records = []
     for r in raw_reviews:
         created = datetime.fromtimestamp(r['timestamp_created'])
@@ -79,15 +394,89 @@ def reviews_to_dataframe(raw_reviews):
             'weighted_vote_score':    r.get('weighted_vote_score'),
             'review_text':            r.get('review'),
         })
-    df = pd.DataFrame.from_records(records)
-    return df
+    return pd.DataFrame.from_records(records)
+
+
+def _dataset_as_raw_reviews(app_id):
+    """Rebuild Steam-shaped review dicts from a stored dataset, so the report can use the bundled data"""
+    df = review_store.get_dataset(app_id).to_dataframe()
+    raw_reviews = []
+    for row in df.itertuples(index=False):
+        raw_reviews.append({
+            'recommendationid': str(row.review_id),
+            'author': {'steamid': str(row.steam_id), 'num_games_owned': row.num_games_owned,
+                       'num_reviews': row.num_reviews_by_user, 'playtime_at_review': row.playtime_at_review_h},
+            'language': row.language,
+            'timestamp_created': int(time.mktime(row.date_of_review.timetuple())),
+            'voted_up': bool(row.recommended),
+            'votes_up': row.votes_helpful,
+            'votes_funny': row.votes_funny,
+            'comment_count': row.comment_count,
+            'steam_purchase': bool(row.steam_purchase),
+            'received_for_free': bool(row.received_for_free),
+            'weighted_vote_score': str(row.weighted_vote_score),
+            'review': row.review_text if isinstance(row.review_text, str) else None,
+        })
+    return raw_reviews
+
+
+def memory_report(app_id):
+    """Print and return the deep memory use per column of the old and the new conversion"""
+    raw_reviews = _dataset_as_raw_reviews(app_id)
+    timings = {}
+    frames = {}
+    for label, convert in (('old', _reviews_to_records_dataframe), ('new', reviews_to_dataframe)):
+        start = time.time()
+        frames[label] = convert(raw_reviews)
+        timings[label] = time.time() - start
+
+    old_usage = frames['old'].memory_usage(deep=True, index=False)
+    new_usage = frames['new'].memory_usage(deep=True, index=False)
+    print(f"Memory report for app {app_id} ({len(raw_reviews):,} reviews, strings: {STRING_DTYPE})")
+    print(f"{'column':<24}{'old dtype':>12}{'old KB':>10}{'new dtype':>16}{'new KB':>10}")
+    for name in REVIEW_FIELDS:
+        print(f"{name:<24}{str(frames['old'][name].dtype):>12}{old_usage[name] / 1024:>10,.0f}"
+              f"{str(frames['new'][name].dtype):>16}{new_usage[name] / 1024:>10,.0f}")
+    print(f"{'total':<24}{'':>12}{old_usage.sum() / 1024:>10,.0f}{'':>16}{new_usage.sum() / 1024:>10,.0f}")
+    print(f"Conversion time: old {timings['old']:.3f}s, new {timings['new']:.3f}s")
+    return {
+        "reviews": len(raw_reviews),
+        "old_bytes": int(old_usage.sum()),
+        "new_bytes": int(new_usage.sum()),
+        "old_seconds": round(timings['old'], 3),
+        "new_seconds": round(timings['new'], 3),
+    }
 
 
 if __name__ == '__main__':
     print("In main")
 
-    # 1) Set your target App ID (e.g., 730 for CS:GO, 440 for Team Fortress 2)
-    app_id = 315210
+    # 1) Target App ID (e.g., 730 for CS:GO, 440 for Team Fortress 2), the first argument if given.
+    #    From the web app, POST /jobs?app_id=... runs the same fetch in the background
+    app_ids = [arg for arg in sys.argv[1:] if arg.isdigit()]
+    app_id = int(app_ids[0]) if app_ids else 315210
+
+    # Run with --memory-report to compare the old and new DataFrame footprints on the bundled dataset
+    if '--memory-report' in sys.argv:
+        memory_report(app_id)
+        sys.exit(0)
+
+    # Run with --stream to write pages to disk as they arrive (resumes after a crash)
+    if '--stream' in sys.argv:
+        directory = stream_steam_reviews(
+            app_id=app_id,
+            filter_by='recent',
+            language='english',
+            day_range=180,
+            review_type='all',
+            purchase_type='all',
+            num_per_page=100
+        )
+        # Aggregates are updated one chunk at a time, never holding every review in memory
+        new_reviews = sum(aggregate_store.add_reviews(app_id, df) for df in iter_stream_reviews(directory))
+        print(f"Added {new_reviews} new reviews to the aggregate store")
+        print("End of main")
+        sys.exit(0)
 
     # 2) Fetch reviews
     print("Before fetch function")
@@ -120,4 +509,8 @@ if __name__ == '__main__':
 
     print(f"\nExported {len(df)} reviews to {output_file}")
 
+    # 5) Update the playtime and daily aggregates with the reviews not counted yet
+    new_reviews = aggregate_store.add_reviews(app_id, df)
+    print(f"Added {new_reviews} new reviews to the aggregate store")
+
     print("End of main")
\ No newline at end of file
@@ -0,0 +1,365 @@
+"""
+Jobs
+Background jobs for work too long for a Flask request thread. An ingest job
+fetches an app's reviews from Steam, converts them to a DataFrame and stores
+them as data/steam_reviews_<app_id>.xlsx (or, when the workbook already
+exists, adds only the new reviews through dataset_refresh). A score job
+scores every review of an app's dataset into its score file (bulk_scoring)
+and builds its keyword search index (review_index); an ingest job ends the
+same way, so the endpoints reading them never do that work in a request.
+
+Jobs run on a small fixed pool of worker threads. Submitting an app that
+already has a queued or running job (of either kind) returns that job instead
+of a new one.
+Every job is a JSON file in data/jobs/, so finished jobs survive a restart;
+jobs that were still queued or running are marked interrupted and can be
+resumed, and a full fetch picks up from its saved cursor (see
+fetch_steam_data.stream_steam_reviews).
+"""
+
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import review_store
+
+JOBS_DIR = os.path.join(review_store.DATA_DIR, "jobs")
+
+# Worker threads running jobs, and how many jobs may wait for one
+MAX_JOB_WORKERS = 2
+MAX_QUEUED_JOBS = 20
+
+# Default fetch options of an ingest job (the ones fetch_steam_data's __main__ used)
+INGEST_DEFAULTS = {
+    'language': 'english',
+    'day_range': 180,
+    'num_per_page': 100,
+}
+
+INGEST, SCORE = "ingest", "score"
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED, INTERRUPTED = (
+    "queued", "running", "succeeded", "failed", "cancelled", "interrupted")
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+class JobQueueFull(Exception):
+    """Raised when MAX_QUEUED_JOBS jobs are already waiting for a worker"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been asked to stop"""
+
+
+_job_fetcher_class = None
+
+
+def _get_job_fetcher_class():
+    """
+    The fetcher class of ingest jobs, defined on first use so importing this
+    module (and main.py with it) does not load requests and pandas
+    """
+    global _job_fetcher_class
+    if _job_fetcher_class is None:
+        import fetch_steam_data
+
+        class _JobFetcher(fetch_steam_data.SteamReviewFetcher):
+            """SteamReviewFetcher that reports every page to its job and stops between pages when cancelled"""
+
+            def __init__(self, manager, job_id, **kwargs):
+                super().__init__(**kwargs)
+                self.manager = manager
+                self.job_id = job_id
+                self.pages = 0
+                self.reviews = 0
+
+            def get_page(self, app_id, params):
+                self.manager._check_cancelled(self.job_id)
+                data = super().get_page(app_id, params)
+                self.pages += 1
+                self.reviews += len(data.get('reviews', []))
+                self.manager._update(self.job_id, progress={"pages": self.pages, "reviews_fetched": self.reviews})
+                return data
+
+        _job_fetcher_class = _JobFetcher
+    return _job_fetcher_class
+
+
+class JobManager:
+    """Bounded worker pool plus the persisted record of every job"""
+
+    def __init__(self, jobs_dir=JOBS_DIR, max_workers=MAX_JOB_WORKERS, max_queued=MAX_QUEUED_JOBS,
+                 fetcher_options=None):
+        self.jobs_dir = jobs_dir
+        self.max_queued = max_queued
+        self.fetcher_options = fetcher_options or {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}             # job_id -> job record
+        self._active = {}           # app_id -> job_id of its queued or running job
+        self._futures = {}          # job_id -> Future
+        self._cancel_events = {}    # job_id -> Event
+        self._rate_limiter = None   # shared by the fetchers of every job, created by the first one
+        self._load()
+
+    # ----- persistence -----
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._path(job["job_id"])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _load(self):
+        """Read every job file; jobs a previous process left queued or running are interrupted"""
+        for path in glob.glob(os.path.join(self.jobs_dir, "*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: skipping unreadable job file {path}: {e}")
+                continue
+            if job["status"] in ACTIVE_STATES:
+                job["status"] = INTERRUPTED
+                job["error"] = "The server stopped before the job finished"
+                job["finished"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                self._save(job)
+            self._jobs[job["job_id"]] = job
+
+    # ----- job records -----
+
+    def get(self, job_id):
+        """A copy of one job record, or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list_jobs(self, limit=50):
+        """The most recently created jobs, newest first"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job["created"], reverse=True)[:limit]
+            return json.loads(json.dumps(jobs))
+
+    def _update(self, job_id, progress=None, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            if progress:
+                job["progress"].update(progress)
+            self._save(job)
+
+    def _check_cancelled(self, job_id):
+        if self._cancel_events[job_id].is_set():
+            raise JobCancelled()
+
+    # ----- submitting, running and cancelling -----
+
+    def submit_ingest(self, app_id, **options):
+        """
+        Queue an ingest job for an app, or return the app's queued/running job.
+        Returns (job record, collapsed) where collapsed is True for an existing job.
+        Raises JobQueueFull when too many jobs are waiting.
+        """
+        options = {**INGEST_DEFAULTS, **{key: value for key, value in options.items() if value is not None}}
+        return self._submit(INGEST, app_id, options)
+
+    def submit_scoring(self, app_id):
+        """Queue a score job for an app, or return the app's queued/running job (see submit_ingest)"""
+        return self._submit(SCORE, app_id, {})
+
+    def _submit(self, kind, app_id, options):
+        app_id = str(app_id)
+        review_store.source_path(app_id)    # rejects app ids that are not numbers
+        with self._lock:
+            existing = self._active.get(app_id)
+            if existing is not None:
+                return json.loads(json.dumps(self._jobs[existing])), True
+            queued = sum(1 for job in self._jobs.values() if job["status"] == QUEUED)
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} jobs are already waiting")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "kind": kind,
+                "app_id": app_id,
+                "options": options,
+                "status": QUEUED,
+                "progress": {"stage": "queued"},
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["job_id"]] = job
+            self._active[app_id] = job["job_id"]
+            self._cancel_events[job["job_id"]] = threading.Event()
+            self._save(job)
+            self._futures[job["job_id"]] = self._executor.submit(self._run, job["job_id"])
+            return json.loads(json.dumps(job)), False
+
+    def resume_interrupted(self):
+        """Queue again every job interrupted by a restart (at most one per app). Returns the new jobs"""
+        with self._lock:
+            interrupted = [job for job in self._jobs.values()
+                           if job["status"] == INTERRUPTED and not job.get("resumed_as")]
+        resumed = []
+        for job in sorted(interrupted, key=lambda job: job["created"]):
+            try:
+                new_job, collapsed = self._submit(job.get("kind", INGEST), job["app_id"], job["options"])
+            except (JobQueueFull, FileNotFoundError) as e:
+                print(f"WARNING: could not resume job {job['job_id']}: {e}")
+                continue
+            # The interrupted record now points at the job that carries on with its work
+            self._update(job["job_id"], resumed_as=new_job["job_id"])
+            if not collapsed:
+                resumed.append(new_job)
+        return resumed
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop. A queued job is cancelled at once, a running one
+        after its current page. Returns the job record, or None if it is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] in ACTIVE_STATES:
+                self._cancel_events[job_id].set()
+                if self._futures[job_id].cancel():
+                    self._finish(job, CANCELLED, error="Cancelled before it started")
+            return json.loads(json.dumps(job))
+
+    def _finish(self, job, status, result=None, error=None):
+        """Record a job's final state. Call with the lock held"""
+        job.update(status=status, result=result, error=error, finished=time.strftime("%Y-%m-%d %H:%M:%S"))
+        job["progress"]["stage"] = status
+        if self._active.get(job["app_id"]) == job["job_id"]:
+            del self._active[job["app_id"]]
+        self._save(job)
+
+    def _run(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=RUNNING, started=time.strftime("%Y-%m-%d %H:%M:%S"))
+            job["progress"]["stage"] = "starting"
+            self._save(job)
+        try:
+            self._check_cancelled(job_id)
+            run = self._score if job["kind"] == SCORE else self._ingest
+            result = run(job_id, job["app_id"], job["options"])
+        except JobCancelled:
+            with self._lock:
+                self._finish(job, CANCELLED, error="Cancelled while running")
+        except Exception as e:
+            print(f"ERROR in job {job_id} (app {job['app_id']}): {e}")
+            with self._lock:
+                self._finish(job, FAILED, error=str(e))
+        else:
+            with self._lock:
+                self._finish(job, SUCCEEDED, result=result)
+
+    def _shared_rate_limiter(self):
+        """One RateLimiter for all jobs, so jobs running side by side stay under the rate together"""
+        import fetch_steam_data
+        with self._lock:
+            if self._rate_limiter is None:
+                self._rate_limiter = self.fetcher_options.get("rate_limiter") or fetch_steam_data.RateLimiter(
+                    self.fetcher_options.get("requests_per_second", fetch_steam_data.REQUESTS_PER_SECOND))
+            return self._rate_limiter
+
+    def _ingest(self, job_id, app_id, options):
+        """fetch -> DataFrame -> workbook for a new app, an incremental refresh for a known one"""
+        import dataset_refresh
+        import fetch_steam_data
+        fetcher = _get_job_fetcher_class()(self, job_id, **{**self.fetcher_options,
+                                                            "rate_limiter": self._shared_rate_limiter()})
+        try:
+            if os.path.exists(review_store.source_path(app_id)):
+                self._update(job_id, progress={"stage": "refresh"})
+                summary = dataset_refresh.refresh_dataset(app_id, language=options['language'],
+                                                          num_per_page=options['num_per_page'], fetcher=fetcher)
+                self._prepare(job_id, app_id)
+                return {"mode": "refresh", **summary}
+
+            self._update(job_id, progress={"stage": "fetch"})
+            stream_options = {'filter_by': 'recent', 'language': options['language'],
+                              'review_type': 'all', 'purchase_type': 'all'}
+            # The stream directory is per app and options, so a cancelled, failed or
+            # interrupted fetch is resumed from its last page by the next job
+            directory = fetch_steam_data.stream_dir_for(app_id, **stream_options)
+            try:
+                fetch_steam_data.stream_steam_reviews(app_id, day_range=options['day_range'],
+                                                      num_per_page=options['num_per_page'],
+                                                      directory=directory, fetcher=fetcher, **stream_options)
+            except fetch_steam_data.StreamOptionsMismatch:
+                # Left behind by a fetch with other options (e.g. day_range), start over
+                shutil.rmtree(directory, ignore_errors=True)
+                fetch_steam_data.stream_steam_reviews(app_id, day_range=options['day_range'],
+                                                      num_per_page=options['num_per_page'],
+                                                      directory=directory, fetcher=fetcher, **stream_options)
+        finally:
+            fetcher.close()
+
+        self._check_cancelled(job_id)
+        self._update(job_id, progress={"stage": "convert"})
+        frames = list(fetch_steam_data.iter_stream_reviews(directory))
+        if not frames:
+            raise ValueError(f"Steam returned no reviews for app {app_id}")
+        import pandas as pd
+        df = pd.concat(frames, ignore_index=True)
+
+        self._check_cancelled(job_id)
+        self._update(job_id, progress={"stage": "store"})
+        stored = dataset_refresh.write_dataset(app_id, df)
+        # Stored for good, the next ingest of this app starts a fresh stream
+        shutil.rmtree(directory, ignore_errors=True)
+        self._prepare(job_id, app_id)
+        return {"mode": "full", "app_id": app_id, "total_reviews": stored,
+                "workbook": os.path.basename(review_store.source_path(app_id))}
+
+    def _prepare(self, job_id, app_id):
+        """Score every review and build the search index, for /bulkScores and /searchReviews"""
+        import bulk_scoring
+        import review_index
+        self._check_cancelled(job_id)
+        self._update(job_id, progress={"stage": "score"})
+        scores = bulk_scoring.get_dataset_scores(app_id)
+        self._check_cancelled(job_id)
+        self._update(job_id, progress={"stage": "index"})
+        review_index.prepare(app_id)
+        return scores
+
+    def _score(self, job_id, app_id, options):
+        """A score job only prepares what the app's endpoints read"""
+        import bulk_scoring
+        scores = self._prepare(job_id, app_id)
+        return {"mode": "score", "app_id": app_id, "total_reviews": len(scores),
+                "score_file": os.path.basename(bulk_scoring.score_file_path(app_id))}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """The process-wide JobManager, created (and its job files read) on first use - Called in main.py"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,229 @@
+"""
+Metrics
+Timing spans and latency histograms for the Flask routes, plus counters read
+from the existing cache stats, exported in the Prometheus text format by
+main.py's /metrics, and sampled structured (JSON) request logs.
+Set SENTIMENT_METRICS=0 to turn everything off: spans become a shared no-op
+and the request hooks return straight away.
+"""
+
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+ENABLED = os.environ.get("SENTIMENT_METRICS", "1") != "0"
+# Fraction of requests written to the structured log (errors are always logged)
+LOG_SAMPLE_RATE = float(os.environ.get("SENTIMENT_LOG_SAMPLE_RATE", "0.01"))
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = logging.getLogger("sentiment_analyser.requests")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+_metrics = []       # every metric, in the order they are exported
+_trace = threading.local()
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, labels, seconds):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[position] += 1
+            values[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(values)) for labels, values in self._values.items())
+        for labels, values in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A metric read from existing stats only when /metrics is scraped (no cost per request)"""
+
+    def __init__(self, name, help_text, metric_type, callback, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.callback = callback      # returns {label values tuple: value}
+        self.label_names = tuple(label_names)
+        _metrics.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+request_seconds = Histogram("sentiment_request_duration_seconds", "Request latency by route",
+                            ("route", "method", "status"))
+stage_seconds = Histogram("sentiment_stage_duration_seconds", "Time each request spent in each stage of its route",
+                          ("route", "stage"))
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "start")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # Summed per request (a stage may run once per sentence batch), observed when the request ends
+        elapsed = time.perf_counter() - self.start
+        stages = self.trace["stages"]
+        stages[self.stage] = stages.get(self.stage, 0.0) + elapsed
+        return False
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(stage):
+    """
+    Time a stage of the current request: `with metrics.span("segment"): ...`
+    Outside a request (bulk scoring, CLI scripts) or when disabled this is a shared no-op.
+    """
+    trace = getattr(_trace, "current", None)
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, stage)
+
+
+def annotate(key, value):
+    """Attach a field (e.g. cache hit or miss) to the current request's log line"""
+    trace = getattr(_trace, "current", None)
+    if trace is not None:
+        trace["fields"][key] = value
+
+
+def begin_request(route):
+    if ENABLED:
+        _trace.current = {"route": route, "stages": {}, "fields": {}, "start": time.perf_counter()}
+
+
+def end_request(method, status):
+    """Record the request latency and maybe write a structured log line"""
+    trace = getattr(_trace, "current", None)
+    if trace is None:
+        return
+    _trace.current = None
+    if trace.get("streaming"):
+        # Finished by traced_stream once the body has been sent
+        trace["response"] = (method, status)
+        return
+    _finish(trace, method, status)
+
+
+def traced_stream(body):
+    """
+    Wrap a streamed response body (a generator) so the work it does still
+    counts for the request that returned it. Flask runs after_request before
+    the body is iterated, so the trace is put back while the body runs and the
+    request is only finished (latency, stages, log line) once it is exhausted.
+    """
+    trace = getattr(_trace, "current", None)
+    if trace is None:
+        return body
+    trace["streaming"] = True
+
+    def traced():
+        _trace.current = trace
+        try:
+            yield from body
+        finally:
+            _trace.current = None
+            method, status = trace.get("response", ("GET", 200))
+            _finish(trace, method, status)
+
+    return traced()
+
+
+def _finish(trace, method, status):
+    elapsed = time.perf_counter() - trace["start"]
+    request_seconds.observe((trace["route"], method, status), elapsed)
+    for stage, seconds in trace["stages"].items():
+        stage_seconds.observe((trace["route"], stage), seconds)
+    if status >= 500 or trace["fields"].get("error") or random.random() < LOG_SAMPLE_RATE:
+        log.info(json.dumps({
+            "event": "request",
+            "route": trace["route"],
+            "method": method,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in trace["stages"].items()},
+            **trace["fields"],
+        }))
+
+
+def init_app(app):
+    """Time every Flask request (route label = view function name)"""
+    if not ENABLED:
+        return
+    from flask import request
+
+    @app.before_request
+    def _start_timing():
+        begin_request(request.endpoint or "unknown")
+
+    @app.after_request
+    def _stop_timing(response):
+        end_request(request.method, response.status_code)
+        return response
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
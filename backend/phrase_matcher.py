@@ -0,0 +1,131 @@
+"""
+Phrase Matcher
+Word-level Aho-Corasick automaton over the lexicon, so single words and
+multi-word entries ("not good", "waste of money") are all found in one
+left-to-right scan of a sentence's words.
+
+Overlapping matches are resolved from the end of the sentence backwards:
+the longest entry ending at a word wins and the words it covers score
+nothing else ("not good" scores as one entry, not as "not" plus "good").
+A sentence without the first two words of any multi-word entry next to
+each other cannot contain one, so it is scored with one dict lookup per word
+and skips the automaton.
+"""
+
+from collections import deque
+from itertools import islice, repeat
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+class PhraseMatcher:
+    """Built from {tuple of words: score}; words must already be formatted like the sentences"""
+
+    def __init__(self, entries):
+        self._goto = [{}]           # state -> {word: next state}
+        self._fail = [0]
+        self._match = [None]        # state -> (length, score) of the longest entry ending here
+        self.phrase_count = 0
+        self.first_words = set()    # first words of the multi-word entries
+        self.first_pairs = set()    # (first word, second word) of the multi-word entries
+        self.word_entries = {}      # word -> score of the single-word entries
+
+        for words, score in entries.items():
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][word] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(None)
+                state = next_state
+            self._match[state] = (len(words), float(score))
+            if len(words) > 1:
+                self.phrase_count += 1
+                self.first_words.add(words[0])
+                self.first_pairs.add((words[0], words[1]))
+            else:
+                self.word_entries[words[0]] = float(score)
+
+        # Breadth-first failure links; a state without an entry of its own
+        # inherits the longest entry of its failure state (a shorter suffix)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                if self._match[child] is None:
+                    self._match[child] = self._match[self._fail[child]]
+                queue.append(child)
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def _longest_matches(self, words):
+        """(length, score) of the longest entry ending at each word, or None"""
+        goto, fail, match = self._goto, self._fail, self._match
+        state = 0
+        found = []
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            found.append(match[state])
+        return found
+
+    def word_scores(self, words):
+        """Score of each word; an entry's score is put on its last word, the words it covers get 0"""
+        found = self._longest_matches(words)
+        scores = [0.0] * len(words)
+        position = len(words) - 1
+        while position >= 0:
+            matched = found[position]
+            if matched is None:
+                position -= 1
+            else:
+                scores[position] = matched[1]
+                position -= matched[0]
+        return scores
+
+    def score(self, words):
+        """
+        Total score of a list of words, the same as sum(word_scores(words)).
+        Only states with an entry are remembered during the scan, so the
+        overlap resolution walks the matches instead of every word.
+        """
+        if self.first_words.isdisjoint(words) or self.first_pairs.isdisjoint(zip(words, islice(words, 1, None))):
+            # Single-word entries only, summed in word order like the automaton does
+            return sum(map(self.word_entries.get, words, repeat(0.0)), 0.0)
+        goto, fail, match = self._goto, self._fail, self._match
+        root = goto[0]
+        state = 0
+        hits = []           # (position, (length, score)) of the longest entry ending there
+        position = 0
+        for word in words:
+            if state:
+                while state and word not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(word, 0)
+            else:
+                state = root.get(word, 0)
+            if state and match[state] is not None:
+                hits.append((position, match[state]))
+            position += 1
+
+        accepted = []
+        covered_from = position
+        for position, (length, score) in reversed(hits):
+            if position < covered_from:
+                accepted.append(score)
+                covered_from = position - length + 1
+        # Summed in word order, like the per-word lookup was
+        accepted.reverse()
+        return sum(accepted, 0.0)
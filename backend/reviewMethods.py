@@ -1,72 +1,170 @@
+import functools
+import heapq
 import itertools
-import os
-import contractions
-import re
+import threading
+import time
+import metrics
+import phrase_matcher
 import sentiment_dict
-import pandas as pd
-from wordsegment import load, segment
+import text_normalizer
 
 # =============================================================================
 # ACTIVE CODE - Currently used functions
 # =============================================================================
 
+# Size of the token -> segmentation memo (check segmentation_stats() before changing)
+SEGMENT_CACHE_SIZE = 50000
+# How many of wordsegment's most frequent unigrams skip segmentation entirely
+COMMON_WORD_COUNT = 5000
+# Sentences formatted and scored between two progress updates of analyze_review_progressive
+SENTENCE_BATCH_SIZE = 50
+
+_segmenter_lock = threading.Lock()
+_segmenter_loaded = False
+_fast_path_words = frozenset()
+_fast_path_lexicon_version = None
+_fast_path_hits = 0
+_fast_path_hits_lock = threading.Lock()
+_phrase_matcher = None
+_phrase_matcher_lexicon_version = None
+
+# Load the wordsegment corpora once per process (format_review used to reload them on every call)
+# wordsegment itself is imported here, on first use, to keep startup fast
+def load_segmenter():
+    global _segmenter_loaded
+    if _segmenter_loaded:
+        return
+    with _segmenter_lock:
+        if not _segmenter_loaded:
+            import wordsegment
+            # The corpora live in wordsegment itself, skip them if another import of this module loaded them
+            if not wordsegment.UNIGRAMS:
+                wordsegment.load()
+            _segmenter_loaded = True
+
+# Words that are already whole words: the most common unigrams plus every single-word
+# lexicon entry (segmenting a lexicon word like "belittle" would otherwise lose its score)
+def _get_fast_path_words():
+    global _fast_path_words, _fast_path_lexicon_version
+    lexicon = sentiment_dict.get_lexicon()
+    if _fast_path_lexicon_version != lexicon.version:
+        load_segmenter()
+        import wordsegment
+        common = sorted(wordsegment.UNIGRAMS, key=wordsegment.UNIGRAMS.get, reverse=True)[:COMMON_WORD_COUNT]
+        lexicon_words = (word for word in lexicon.scores if word.isalnum() and word.islower())
+        _fast_path_words = frozenset(itertools.chain(common, lexicon_words))
+        _fast_path_lexicon_version = lexicon.version
+    return _fast_path_words
+
+# Memoized segmentation of a single whitespace token
+@functools.lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _segment_token(word):
+    from wordsegment import segment
+    return ' '.join(segment(word))
+
+# Lexicon entries as the words format_review produces: plain lower-case words are kept
+# as they are, anything else ("not good", "can't stand", "cover-up") goes through the
+# same cleaning and segmentation as a review sentence, so it can match as a phrase
+def _lexicon_entry_words(entry):
+    if entry.isalnum() and entry.islower():
+        return (entry,)
+    return tuple(segment_sentence(' '.join(text_normalizer.split_sentences(entry))).split())
+
+# Automaton over every lexicon entry, rebuilt when the lexicon changes - Used by _score_sentences
+def get_phrase_matcher():
+    global _phrase_matcher, _phrase_matcher_lexicon_version
+    lexicon = sentiment_dict.get_lexicon()
+    if _phrase_matcher_lexicon_version != lexicon.version:
+        entries = {}
+        # Plain words first, so an explicit entry wins over another entry that normalizes to it
+        for entry, score in sorted(lexicon.scores.items(), key=lambda item: not (item[0].isalnum() and item[0].islower())):
+            # Upper-case single words ("TRUE", "FALSE" as the spreadsheet saved them) never
+            # matched the lower-cased review words, keep it that way instead of scoring "true"
+            if entry.isalnum() and not entry.islower():
+                continue
+            entries.setdefault(_lexicon_entry_words(entry), score)
+        _phrase_matcher = phrase_matcher.PhraseMatcher(entries)
+        _phrase_matcher_lexicon_version = lexicon.version
+    return _phrase_matcher
+
+# Hit rates of the segmentation fast path and memo, used to size SEGMENT_CACHE_SIZE
+def segmentation_stats():
+    info = _segment_token.cache_info()
+    lookups = _fast_path_hits + info.hits + info.misses
+    return {
+        "fast_path_hits": _fast_path_hits,
+        "cache_hits": info.hits,
+        "cache_misses": info.misses,
+        "cache_size": info.currsize,
+        "cache_max_size": info.maxsize,
+        "hit_rate": (_fast_path_hits + info.hits) / lookups if lookups else 0.0,
+    }
+
 # Zacc's code (Used by format_review)
-def segment_sentence(sentence):
+# Callers segmenting a whole review pass fast_path_words in, so the lexicon
+# version is checked once per review instead of once per sentence
+def segment_sentence(sentence, fast_path_words=None):
+    global _fast_path_hits
+    if fast_path_words is None:
+        load_segmenter()
+        fast_path_words = _get_fast_path_words()
     # Segmentation
     listOfSegmentedResults = []
+    hits = 0
     for word in sentence.split():
-        word = segment(word)
-        segmentResult = ' '.join(word)
+        lowered = word.lower()
+        if lowered in fast_path_words:
+            # Known whole word, nothing to segment
+            hits += 1
+            segmentResult = lowered
+        else:
+            segmentResult = _segment_token(word)
         listOfSegmentedResults.append(segmentResult)
+    # Scoring threads share the counter (each worker process has its own)
+    with _fast_path_hits_lock:
+        _fast_path_hits += hits
     combined_string = ' '.join(listOfSegmentedResults)
     return combined_string
 
 # Prepare review for scoring (Zacc's code, edited by Mus) - Used by sentence_score_calculator and score_paragraphs_SlidingWindow
+# Sentence splitting, character filtering and contraction expansion are done by text_normalizer
 def format_review(review):
-    load()
+    load_segmenter()
+    fast_path_words = _get_fast_path_words()
     finalResult = []
-    listOfSentences = []
-    listOfCleanedSentences = []
-    review = re.sub('_x000D_', '', review)
-
-    # Split review into sentences
-    # Edited by Ethel: Use proper sentence splitting with multiple punctuation marks
-    sentences = re.split(r'[.!?]+', review)
-    for sentence in sentences:
-        if len(sentence.strip()) != 0:  # Also strip whitespace
-            listOfSentences.append(sentence.strip())
-    # Remove parenthesis contractions by splitting them into their base
-    for sentence in listOfSentences:
-            sentence = re.sub(r'\-', ' ', sentence)
-            sentence = re.sub(r'[^a-zA-Z\d\s:]', '', sentence)
-            listOfCleanedSentences.append(contractions.fix(sentence))
-    
+
+    with metrics.span("normalize"):
+        sentences = text_normalizer.split_sentences(review)
+
     # Segmentation
-    for sentence in listOfCleanedSentences:
-        finalResult.append(segment_sentence(sentence))
+    with metrics.span("segment"):
+        for sentence in sentences:
+            finalResult.append(segment_sentence(sentence, fast_path_words))
     return finalResult
 
-# Function to calculate sentiment score of each sentence in a review 
-# (Zacc and Ethel's code - Optimized for performance) - Called in main.py
-def sentence_score_calculator(review_to_be_scored):
-    # Cache the sentiment dictionary to avoid repeated calls
-    word_scores = sentiment_dict.wordScores()
-    
-    cleanedSentence = format_review(review_to_be_scored)
+# Score already-formatted sentences (shared by sentence_score_calculator and analyze_review)
+# Single words and multi-word lexicon entries are found in one scan of each sentence
+def _score_sentences(cleaned_sentences, matcher):
     results = []
-    
-    # Process sentences more efficiently while maintaining original logic
-    for sentence in cleanedSentence:
-        score = sum(float(word_scores.get(word, 0)) for word in sentence.split())
+    for sentence in cleaned_sentences:
+        score = matcher.score(sentence.split())
         results.append([sentence, score])
-    
+
     # Sort once at the end
     sorted_results = sorted(results, key=lambda x: x[1], reverse=True)
-    
     return results, sorted_results
 
-# Mus' code - Called in main.py
-def score_paragraphs_SlidingWindow(review, window_size=5, step_size=1):
+# Function to calculate sentiment score of each sentence in a review 
+# (Zacc and Ethel's code - Optimized for performance)
+def sentence_score_calculator(review_to_be_scored):
+    # Cached lexicon automaton (rebuilt only when the dictionary changes)
+    matcher = get_phrase_matcher()
+    
+    cleanedSentence = format_review(review_to_be_scored)
+    return _score_sentences(cleanedSentence, matcher)
+
+# Mus' code
+def score_paragraphs_SlidingWindow(review, window_size=5, step_size=1, top_k=None):
     """
     Core sliding window function for sentiment analysis of paragraphs.
     Original algorithm by Mus, optimized for performance and bug fixes.
@@ -75,45 +173,169 @@ def score_paragraphs_SlidingWindow(review, window_size=5, step_size=1):
         1. Split given review into sentences using punctuation
         2. Create overlapping windows of sentences
         3. Calculate sentiment score for each window
+
+    With top_k set, only the top_k most positive and top_k most negative
+    windows are returned (still sorted from most positive to most negative).
     """
     if not review or not review.strip():
         return []
     
-    # Cache the sentiment dictionary for performance
-    word_scores = sentiment_dict.wordScores()
+    # Cached lexicon automaton for performance
+    matcher = get_phrase_matcher()
     cleaned_sentences = format_review(review)
-    
+    sentence_scores = [score for _, score in _score_sentences(cleaned_sentences, matcher)[0]]
+    return _score_windows(cleaned_sentences, sentence_scores, window_size, step_size, top_k)
+
+# Sliding window over already-formatted and scored sentences (Mus' algorithm)
+def _score_windows(cleaned_sentences, sentence_scores, window_size, step_size, top_k=None):
     if len(cleaned_sentences) < window_size:
         # If review is shorter than window, analyze as single window
         window_size = len(cleaned_sentences)
-    
+
+    # (1a) Prefix sums of sentence scores, so every window score is one subtraction
+    # instead of re-summing every word in the window
+    prefix = [0.0]
+    prefix.extend(itertools.accumulate(sentence_scores))
+
+    # (1b) Score every possible starting position for windows
+    starts = range(0, len(cleaned_sentences) - window_size + 1, step_size)
+    window_scores = [prefix[i + window_size] - prefix[i] for i in starts]
+
+    # (2) Pick the windows to return, most positive first (ties keep review order)
+    if top_k is None:
+        chosen = sorted(range(len(starts)), key=lambda j: window_scores[j], reverse=True)
+    else:
+        # Partial selection with a heap instead of sorting every window
+        rank = lambda j: (window_scores[j], -j)
+        top = heapq.nlargest(top_k, range(len(starts)), key=rank)
+        bottom = heapq.nsmallest(top_k, range(len(starts)), key=rank)
+        top_set = set(top)
+        chosen = top + [j for j in reversed(bottom) if j not in top_set]
+
+    # (3) Only build paragraph text for the windows being returned
     scored_paragraphs = []
-        
-    # 1 Apply sliding window technique to create paragraph windows
-    # Loop through possible starting positions for windows
-    for i in range(0, len(cleaned_sentences) - window_size + 1, step_size):
-        
-        # Extract current window of sentences
+    for j in chosen:
+        i = starts[j]
         window_sentences = cleaned_sentences[i:i + window_size]
-
-        # Join sentences into a single paragraph with proper punctuation
-        paragraph_text = '. '.join(window_sentences) + '.'
-        
-        # (1a) Calculate sentiment score for this paragraph window
-        # (1b) Sum sentiment scores for all words in the paragraph
-        # Fixed: Only score words in current window, not all sentences
-        window_score = 0
-        for sentence in window_sentences:  # Only score sentences in this window
-            for word in sentence.split():
-                window_score += float(word_scores.get(word, 0))
-
-        # (1c) Store data about this paragraph window
         scored_paragraphs.append({
-            "paragraph": paragraph_text,              # The actual text
-            "raw_score": window_score,               # Total sentiment score
-            "window_position": i,                    # Starting sentence position
-            "sentences_in_window": len(window_sentences)  # Window size used
+            "paragraph": '. '.join(window_sentences) + '.',   # The actual text
+            "raw_score": window_scores[j],                    # Total sentiment score
+            "window_position": i,                             # Starting sentence position
+            "sentences_in_window": len(window_sentences)      # Window size used
         })
-        
-    scored_paragraphs_sorted = sorted(scored_paragraphs, key=lambda x: x["raw_score"], reverse=True)
-    return scored_paragraphs_sorted
\ No newline at end of file
+    return scored_paragraphs
+
+# Single-pass analysis - Called in main.py
+def analyze_review(review, window_size=5, step_size=1, top_k=None):
+    """
+    Format and score a review once, then derive every result from that pass.
+    Same output as calling sentence_score_calculator and
+    score_paragraphs_SlidingWindow separately, but format_review
+    (regex, contractions and word segmentation) only runs once.
+
+    Returns a dict with:
+        sentence_score         [sentence, score] pairs in review order
+        sorted_sentence_score  the same pairs sorted from most positive
+        scored_paragraphs      sliding window paragraphs sorted from most positive
+                               (only the top_k best and worst windows if top_k is set)
+    """
+    matcher = get_phrase_matcher()
+    cleaned_sentences = format_review(review)
+    with metrics.span("sentence_score"):
+        sentence_score, sorted_sentence_score = _score_sentences(cleaned_sentences, matcher)
+
+    with metrics.span("window_score"):
+        if not review or not review.strip():
+            scored_paragraphs = []
+        else:
+            sentence_scores = [score for _, score in sentence_score]
+            scored_paragraphs = _score_windows(cleaned_sentences, sentence_scores, window_size, step_size, top_k)
+
+    return {
+        "sentence_score": sentence_score,
+        "sorted_sentence_score": sorted_sentence_score,
+        "scored_paragraphs": scored_paragraphs,
+    }
+
+# Progressive analysis for very long reviews - Called in main.py
+def analyze_review_progressive(review, window_size=5, step_size=1, batch_size=SENTENCE_BATCH_SIZE, time_budget=None):
+    """
+    analyze_review done in batches of sentences, yielding a progress dict after each batch:
+        sentences_done, sentences_total
+        sentence_score             [sentence, score] pairs of this batch only
+        best_window, worst_window  most positive / most negative complete window so far
+                                   ({"window_position", "raw_score"}, or None)
+    The last dict has "done": True and the analyze_review result (top_k=1) plus
+    "partial", "sentences_analyzed" and "sentences_total". When time_budget
+    (seconds) runs out before every sentence is scored, that result only covers
+    the sentences analysed so far and "partial" is True.
+    The budget is checked between batches, so the first batch always runs and
+    any batch can overrun it.
+    """
+    start_time = time.perf_counter()
+    matcher = get_phrase_matcher()
+    load_segmenter()
+    fast_path_words = _get_fast_path_words()
+    with metrics.span("normalize"):
+        sentences = text_normalizer.split_sentences(review) if review and review.strip() else []
+    total = len(sentences)
+
+    cleaned_sentences = []
+    sentence_score = []
+    # Running best/worst complete window, ranked like _score_windows with top_k=1
+    window = min(window_size, total)
+    prefix = [0.0]
+    next_start = 0
+    best = worst = None
+    partial = False
+
+    while len(cleaned_sentences) < total:
+        # At least one batch is always scored, so a partial result is never empty
+        if cleaned_sentences and time_budget is not None and time.perf_counter() - start_time > time_budget:
+            partial = True
+            break
+        # The stages are summed over the batches, like one analyze_review call
+        with metrics.span("segment"):
+            batch = [segment_sentence(sentence, fast_path_words) for sentence in sentences[len(cleaned_sentences):len(cleaned_sentences) + batch_size]]
+        with metrics.span("sentence_score"):
+            batch_scores, _ = _score_sentences(batch, matcher)
+        cleaned_sentences.extend(batch)
+        sentence_score.extend(batch_scores)
+
+        with metrics.span("window_score"):
+            for _, score in batch_scores:
+                prefix.append(prefix[-1] + score)
+            while window and next_start + window <= len(cleaned_sentences):
+                score = prefix[next_start + window] - prefix[next_start]
+                if best is None or score > best[0]:
+                    best = (score, next_start)
+                if worst is None or score <= worst[0]:
+                    worst = (score, next_start)
+                next_start += step_size
+
+        yield {
+            "done": False,
+            "sentences_done": len(cleaned_sentences),
+            "sentences_total": total,
+            "sentence_score": batch_scores,
+            "best_window": best and {"window_position": best[1], "raw_score": best[0]},
+            "worst_window": worst and {"window_position": worst[1], "raw_score": worst[0]},
+        }
+
+    with metrics.span("window_score"):
+        if cleaned_sentences:
+            scores = [score for _, score in sentence_score]
+            scored_paragraphs = _score_windows(cleaned_sentences, scores, window_size, step_size, top_k=1)
+        else:
+            scored_paragraphs = []
+    with metrics.span("sentence_score"):
+        sorted_sentence_score = sorted(sentence_score, key=lambda x: x[1], reverse=True)
+    yield {
+        "done": True,
+        "partial": partial,
+        "sentences_analyzed": len(cleaned_sentences),
+        "sentences_total": total,
+        "sentence_score": sentence_score,
+        "sorted_sentence_score": sorted_sentence_score,
+        "scored_paragraphs": scored_paragraphs,
+    }
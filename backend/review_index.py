@@ -0,0 +1,298 @@
+"""
+Review Index
+Per-app inverted index (term -> sorted row ids) over the review text as cleaned
+by data_to_frontend, stored inside the dataset's columnar directory so it is
+rebuilt whenever the workbook changes. Boolean keyword queries are answered
+with NumPy set operations on the posting lists, together with the matching
+reviews' lexicon score, recommended ratio and a playtime breakdown.
+Building the index and scoring every review takes seconds, so jobs (after an
+ingest, or a score job queued by /searchReviews) and the pre-warm call prepare()
+and requests only search once is_ready() says nothing is left to build.
+
+Query syntax: words are ANDed, with AND / OR / NOT (upper case) and parentheses,
+e.g.  crash OR performance    crash NOT refund    (lag OR stutter) AND multiplayer
+
+Usage:
+    python backend/review_index.py 315210 "crash OR performance"
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+import aggregate_store
+import bulk_scoring
+import data_to_frontend
+import review_store
+import sentiment_dict
+
+INDEX_PREFIX = "search_index"
+TERMS_FILE = f"{INDEX_PREFIX}.terms.json"
+POSTINGS_FILE = f"{INDEX_PREFIX}.postings.npy"
+OFFSETS_FILE = f"{INDEX_PREFIX}.offsets.npy"
+# Lexicon total_score per row, named after the lexicon version it was scored with
+SCORES_FILE = INDEX_PREFIX + ".scores-{version}.npy"
+
+# Terms are runs of lower-case letters and digits ("don't" is indexed as "don" and "t")
+_TERM = re.compile(r"[a-z0-9]+")
+_QUERY_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+OPERATORS = ("AND", "OR", "NOT")
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+_indexes = {}       # app_id -> loaded ReviewIndex (for the current dataset version)
+_app_locks = {}     # app_id -> Lock, so an index is only built once at a time
+_locks_lock = threading.Lock()
+
+
+def _app_lock(app_id):
+    with _locks_lock:
+        return _app_locks.setdefault(app_id, threading.Lock())
+
+
+def terms_of(text):
+    """The distinct index terms of one cleaned review"""
+    return set(_TERM.findall(text.lower()))
+
+
+def _save_array(directory, name, array):
+    """np.save under a temporary name, then swap it in"""
+    path = os.path.join(directory, name)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def build_index(dataset):
+    """Write the posting lists of every term in the dataset next to its columnar data"""
+    start = time.time()
+    vocabulary = {}
+    term_ids = []
+    row_ids = []
+    for row, text in enumerate(dataset.text('review_text')):
+        ids = [vocabulary.setdefault(term, len(vocabulary)) for term in terms_of(data_to_frontend.clean_review_text(text))]
+        term_ids.extend(ids)
+        row_ids.extend([row] * len(ids))
+
+    # Group the (term, row) pairs by term; a stable sort keeps every posting list in row order
+    term_ids = np.array(term_ids, dtype=np.int32)
+    order = np.argsort(term_ids, kind='stable')
+    postings = np.array(row_ids, dtype=np.int32)[order]
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+
+    _save_array(dataset.directory, POSTINGS_FILE, postings)
+    _save_array(dataset.directory, OFFSETS_FILE, offsets)
+    # The term list goes last, its presence marks a complete index
+    terms_path = os.path.join(dataset.directory, TERMS_FILE)
+    with open(terms_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(list(vocabulary), f)
+    os.replace(terms_path + ".tmp", terms_path)
+    print(f"Indexed {len(dataset)} reviews of app {dataset.app_id}: {len(vocabulary)} terms, "
+          f"{len(postings)} postings in {time.time() - start:.2f}s")
+
+
+class ReviewIndex:
+    """Memory-mapped posting lists of one dataset version"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        with open(os.path.join(dataset.directory, TERMS_FILE), "r", encoding="utf-8") as f:
+            self.terms = {term: term_id for term_id, term in enumerate(json.load(f))}
+        self.postings = np.load(os.path.join(dataset.directory, POSTINGS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(dataset.directory, OFFSETS_FILE))
+        self._scores = None     # (lexicon version, total_score per row)
+        self._scores_lock = threading.Lock()
+
+    def rows_with(self, term):
+        """Sorted row ids of the reviews containing a term"""
+        term_id = self.terms.get(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int32)
+        return np.asarray(self.postings[self.offsets[term_id]:self.offsets[term_id + 1]])
+
+    def all_rows(self):
+        return np.arange(len(self.dataset), dtype=np.int32)
+
+    def scores(self):
+        """Lexicon total_score of every row, scored once per lexicon version and kept next to the index"""
+        version = sentiment_dict.get_lexicon().version
+        with self._scores_lock:
+            if self._scores is not None and self._scores[0] == version:
+                return self._scores[1]
+            path = os.path.join(self.dataset.directory, SCORES_FILE.format(version=version))
+            try:
+                scores = np.load(path)
+            except (OSError, ValueError):
+                scores = bulk_scoring.get_dataset_scores(self.dataset.app_id)['total_score'].to_numpy(dtype=np.float64)
+                for stale in glob.glob(os.path.join(self.dataset.directory, SCORES_FILE.format(version="*"))):
+                    os.remove(stale)
+                _save_array(self.dataset.directory, os.path.basename(path), scores)
+            self._scores = (version, scores)
+            return scores
+
+
+def get_index(app_id):
+    """The ReviewIndex of an app's current dataset, built on first use (raises FileNotFoundError without a dataset)"""
+    app_id = str(app_id)
+    dataset = review_store.get_dataset(app_id)
+    index = _indexes.get(app_id)
+    if index is not None and index.dataset is dataset:
+        return index
+    with _app_lock(app_id):
+        index = _indexes.get(app_id)
+        if index is None or index.dataset is not dataset:
+            if not os.path.exists(os.path.join(dataset.directory, TERMS_FILE)):
+                build_index(dataset)
+            index = _indexes[app_id] = ReviewIndex(dataset)
+    return index
+
+
+def is_ready(app_id):
+    """True when the app's index and its row scores for the current lexicon are on disk - Called in main.py"""
+    dataset = review_store.get_dataset(app_id)
+    version = sentiment_dict.get_lexicon().version
+    return all(os.path.exists(os.path.join(dataset.directory, name))
+               for name in (TERMS_FILE, SCORES_FILE.format(version=version)))
+
+
+def prepare(app_id):
+    """Build the index and score every row, whatever is still missing - Called by jobs and warmup"""
+    get_index(app_id).scores()
+
+
+class _QueryParser:
+    """
+    Recursive descent over the query tokens:
+        expr     := and_expr (OR and_expr)*
+        and_expr := not_expr ([AND] not_expr)*
+        not_expr := NOT not_expr | '(' expr ')' | word
+    Every node evaluates to a sorted array of row ids.
+    """
+
+    def __init__(self, index, query):
+        self.index = index
+        self.tokens = _QUERY_TOKEN.findall(query)
+        self.position = 0
+        self.terms = []
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty query")
+        rows = self._expr()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position]!r} in query")
+        return rows
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _expr(self):
+        rows = self._and_expr()
+        while self._peek() == "OR":
+            self._next()
+            rows = np.union1d(rows, self._and_expr())
+        return rows
+
+    def _and_expr(self):
+        rows = self._not_expr()
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self._next()
+            rows = np.intersect1d(rows, self._not_expr(), assume_unique=True)
+        return rows
+
+    def _not_expr(self):
+        token = self._next()
+        if token is None:
+            raise ValueError("Query ends where a word was expected")
+        if token == "NOT":
+            return np.setdiff1d(self.index.all_rows(), self._not_expr(), assume_unique=True)
+        if token == "(":
+            rows = self._expr()
+            if self._next() != ")":
+                raise ValueError("Missing ')' in query")
+            return rows
+        if token in (")", "AND", "OR"):
+            raise ValueError(f"Unexpected {token!r} in query")
+        # A word that cleans to several terms ("don't", "co-op") needs all of them
+        terms = _TERM.findall(token.lower())
+        if not terms:
+            raise ValueError(f"{token!r} contains no searchable characters")
+        self.terms.extend(terms)
+        rows = self.index.rows_with(terms[0])
+        for term in terms[1:]:
+            rows = np.intersect1d(rows, self.index.rows_with(term), assume_unique=True)
+        return rows
+
+
+def _summary(rows, scores, recommended):
+    count = len(rows)
+    return {
+        "count": count,
+        "total_score": round(float(scores[rows].sum()), 3),
+        "mean_score": round(float(scores[rows].mean()), 3) if count else None,
+        "recommended_ratio": round(float(recommended[rows].mean()), 3) if count else None,
+    }
+
+
+def search(app_id, query, offset=0, limit=100):
+    """
+    Run a boolean keyword query over an app's reviews.
+    Returns the matching count, one page of review ids and the lexicon score,
+    recommended ratio and playtime breakdown of all matches.
+    Raises ValueError for a malformed query and FileNotFoundError without a dataset.
+    """
+    start = time.perf_counter()
+    index = get_index(app_id)
+    parser = _QueryParser(index, query)
+    rows = parser.parse()
+
+    dataset = index.dataset
+    scores = index.scores()
+    recommended = np.asarray(dataset.column('recommended'), dtype=bool)
+    # playtime_at_review_h holds minutes, the bins are in hours (same bins as the playtime summary)
+    hours = np.asarray(dataset.column('playtime_at_review_h'), dtype=np.float64)[rows] / 60
+    bin_of_row = np.digitize(hours, aggregate_store.PLAYTIME_BINS) - 1
+
+    return {
+        "app_id": dataset.app_id,
+        "query": query,
+        "terms": sorted(set(parser.terms)),
+        "matching_reviews": len(rows),
+        "offset": offset,
+        "limit": limit,
+        "review_ids": [int(review_id) for review_id in np.asarray(dataset.column('review_id'))[rows[offset:offset + limit]]],
+        **{key: value for key, value in _summary(rows, scores, recommended).items() if key != "count"},
+        "playtime_bins": [{"playtime_bin": label, **_summary(rows[bin_of_row == position], scores, recommended)}
+                          for position, label in enumerate(aggregate_store.PLAYTIME_LABELS)],
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boolean keyword search over an app's reviews")
+    parser.add_argument("app_id", help="Steam app id (reads data/steam_reviews_<app_id>.xlsx)")
+    parser.add_argument("query", help='e.g. "crash OR performance"')
+    parser.add_argument("--limit", type=int, default=10, help="How many matching review ids to print")
+    args = parser.parse_args()
+
+    result = search(args.app_id, args.query, limit=args.limit)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
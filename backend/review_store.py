@@ -0,0 +1,303 @@
+"""
+Review Store
+Converts each steam_reviews_<app_id>.xlsx workbook once into memory-mapped
+NumPy columns so requests never have to re-parse the spreadsheet
+"""
+
+import json
+import os
+import shutil
+import threading
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+STORE_DIR = os.path.join(DATA_DIR, "columnar")
+
+# How many loaded datasets to keep in memory at once (least recently used is dropped)
+MAX_CACHED_DATASETS = 4
+
+MANIFEST_NAME = "manifest.json"
+# Apps whose datasets were loaded most recently (newest first), read by the startup pre-warm
+RECENT_FILE = os.path.join(STORE_DIR, "recent.json")
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+_cache = OrderedDict()          # app_id -> ReviewDataset
+_cache_lock = threading.Lock()
+_convert_locks = {}             # app_id -> Lock, so one app is only converted once at a time
+
+
+def source_path(app_id):
+    """Path of the raw review workbook for an app"""
+    if not str(app_id).isdigit():
+        # app_id comes straight from the query string, never let it escape data/
+        raise FileNotFoundError(f"Invalid app_id: {app_id!r}")
+    return os.path.join(DATA_DIR, f"steam_reviews_{app_id}.xlsx")
+
+
+def _source_version(path):
+    """Cheap version stamp of the workbook, changes whenever the file is rewritten"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def source_fingerprint(app_id, path=None):
+    """
+    SHA-1 of an app's workbook, the fingerprint its ReviewDataset has once converted.
+    Pass path for a workbook that is about to replace the current one
+    """
+    return _file_sha1(path or source_path(app_id))
+
+
+class ReviewDataset:
+    """
+    Read-only view over the columnar copy of one workbook.
+    Numeric, boolean and datetime columns are memory-mapped .npy files.
+    Text columns are one UTF-8 blob plus an offsets array, so single rows
+    can be decoded without touching the rest of the column.
+    """
+
+    def __init__(self, app_id, directory):
+        self.app_id = str(app_id)
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.version = manifest["source_version"]
+        self.fingerprint = manifest["source_sha1"]
+        self.num_rows = manifest["num_rows"]
+        self.column_kinds = manifest["columns"]   # keeps the workbook's column order
+
+        self._arrays = {}
+        self._texts = {}
+        for name, kind in self.column_kinds.items():
+            if kind == "text":
+                offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+                nulls = np.load(os.path.join(directory, f"{name}.null.npy"), mmap_mode="r")
+                blob_path = os.path.join(directory, f"{name}.blob")
+                if os.path.getsize(blob_path) > 0:
+                    blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+                else:
+                    blob = np.zeros(0, dtype=np.uint8)
+                self._texts[name] = (offsets, nulls, blob)
+            else:
+                self._arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        # review_id -> row offset, built on the first lookup
+        self._row_index = None
+        self._row_index_lock = threading.Lock()
+        # text column -> (codes, labels) for low-cardinality columns such as language
+        self._categories = {}
+
+    def __len__(self):
+        return self.num_rows
+
+    @property
+    def columns(self):
+        return list(self.column_kinds)
+
+    def column(self, name):
+        """
+        Return a column as a NumPy array: numeric columns memory-mapped, text
+        columns decoded into an object array (NaN for missing values)
+        """
+        if name in self._texts:
+            return np.array(self.text(name), dtype=object)
+        return self._arrays[name]
+
+    def text(self, name, rows=None):
+        """Decode a text column, either fully or only for the given row positions"""
+        offsets, nulls, blob = self._texts[name]
+        if rows is None:
+            rows = range(self.num_rows)
+            raw = blob.tobytes()
+        else:
+            rows = [int(r) for r in rows]
+            raw = None
+        values = []
+        for row in rows:
+            if nulls[row]:
+                values.append(np.nan)
+                continue
+            start, end = int(offsets[row]), int(offsets[row + 1])
+            if raw is not None:
+                values.append(raw[start:end].decode("utf-8"))
+            else:
+                values.append(blob[start:end].tobytes().decode("utf-8"))
+        return values
+
+    def categories(self, name):
+        """
+        A text column as integer codes plus the distinct labels (-1 for nulls),
+        decoded once per dataset so filters on it are plain NumPy comparisons
+        """
+        if name not in self._categories:
+            import pandas as pd
+            codes, labels = pd.factorize(pd.Series(self.text(name), dtype=object))
+            self._categories[name] = (codes.astype(np.int32), list(labels))
+        return self._categories[name]
+
+    def row_of(self, review_id):
+        """Row offset of a review_id in constant time, or None if it is not in this dataset"""
+        index = self._row_index
+        if index is None:
+            with self._row_index_lock:
+                if self._row_index is None:
+                    ids = self._arrays["review_id"].tolist()
+                    self._row_index = dict(zip(ids, range(len(ids))))
+                index = self._row_index
+        try:
+            return index.get(int(review_id))
+        except (TypeError, ValueError):
+            return None
+
+    def to_dataframe(self, columns=None, rows=None):
+        """Materialise (part of) the dataset as a fresh pandas DataFrame"""
+        import pandas as pd
+        columns = columns or self.columns
+        data = {}
+        for name in columns:
+            if name in self._texts:
+                data[name] = pd.Series(self.text(name, rows), dtype=object)
+            else:
+                values = self._arrays[name]
+                data[name] = np.array(values if rows is None else values[list(rows)])
+        return pd.DataFrame(data, columns=columns)
+
+
+def _write_columns(df, directory, version, sha1):
+    """Write every DataFrame column to its own file inside directory"""
+    import pandas as pd
+    kinds = {}
+    for name in df.columns:
+        series = df[name]
+        if (pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series)
+                or pd.api.types.is_datetime64_any_dtype(series)):
+            np.save(os.path.join(directory, f"{name}.npy"), series.to_numpy())
+            kinds[name] = "numeric"
+            continue
+
+        # Everything else is stored as text
+        nulls = series.isna().to_numpy()
+        encoded = [b"" if null else str(value).encode("utf-8")
+                   for value, null in zip(series.tolist(), nulls)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        with open(os.path.join(directory, f"{name}.blob"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+        np.save(os.path.join(directory, f"{name}.null.npy"), nulls)
+        kinds[name] = "text"
+
+    manifest = {
+        "source_version": version,
+        "source_sha1": sha1,
+        "num_rows": len(df),
+        "columns": kinds,
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _convert(app_id, path, version):
+    """Convert the workbook into a new columnar directory and return its path"""
+    final_dir = os.path.join(STORE_DIR, f"{app_id}-{version}")
+    if os.path.exists(os.path.join(final_dir, MANIFEST_NAME)):
+        return final_dir
+
+    import pandas as pd
+    print(f"Converting {path} to columnar store...")
+    df = pd.read_excel(path)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        _write_columns(df, tmp_dir, version, _file_sha1(path))
+        os.rename(tmp_dir, final_dir)
+    except OSError:
+        # Another process finished the same conversion first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(final_dir, MANIFEST_NAME)):
+            raise
+
+    # Remove copies made from older versions of this workbook (may still be mapped on Windows)
+    for entry in os.listdir(STORE_DIR):
+        if entry.startswith(f"{app_id}-") and entry != os.path.basename(final_dir) and ".tmp-" not in entry:
+            shutil.rmtree(os.path.join(STORE_DIR, entry), ignore_errors=True)
+    return final_dir
+
+
+def recent_app_ids(limit=MAX_CACHED_DATASETS):
+    """App ids of the most recently loaded datasets, newest first"""
+    try:
+        with open(RECENT_FILE, "r", encoding="utf-8") as f:
+            return [str(app_id) for app_id in json.load(f)][:limit]
+    except (OSError, ValueError):
+        return []
+
+
+def _remember_recent(app_id):
+    """Move app_id to the front of RECENT_FILE (only written when a dataset is loaded, not on cache hits)"""
+    recent = [app_id] + [other for other in recent_app_ids(limit=None) if other != app_id]
+    tmp_path = f"{RECENT_FILE}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(recent[:MAX_CACHED_DATASETS * 4], f)
+        os.replace(tmp_path, RECENT_FILE)
+    except OSError as e:
+        print(f"WARNING: could not record recent dataset {app_id}: {e}")
+
+
+def get_dataset(app_id):
+    """
+    Return the ReviewDataset for an app, converting the workbook on first use
+    and whenever its modification time or size changes.
+    Raises FileNotFoundError if there is no workbook for the app.
+    """
+    app_id = str(app_id)
+    path = source_path(app_id)
+    version = _source_version(path)
+
+    with _cache_lock:
+        dataset = _cache.get(app_id)
+        if dataset is not None and dataset.version == version:
+            _cache.move_to_end(app_id)
+            return dataset
+        convert_lock = _convert_locks.setdefault(app_id, threading.Lock())
+
+    with convert_lock:
+        # Re-check in case another thread loaded it while we waited
+        with _cache_lock:
+            dataset = _cache.get(app_id)
+            if dataset is not None and dataset.version == version:
+                _cache.move_to_end(app_id)
+                return dataset
+
+        os.makedirs(STORE_DIR, exist_ok=True)
+        dataset = ReviewDataset(app_id, _convert(app_id, path, version))
+
+        with _cache_lock:
+            _cache[app_id] = dataset
+            _cache.move_to_end(app_id)
+            while len(_cache) > MAX_CACHED_DATASETS:
+                _cache.popitem(last=False)
+        _remember_recent(app_id)
+    return dataset
+
+
+def clear_cache():
+    """Drop every in-process dataset (the on-disk columnar copies are kept)"""
+    with _cache_lock:
+        _cache.clear()
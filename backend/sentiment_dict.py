@@ -1,30 +1,97 @@
 import csv
+import hashlib
 import os
+import threading
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 file_path = os.path.join(BASE_DIR, "..", "data", "sentiment_dictionary.csv")
 
+# Bumped whenever the way entries are matched changes (2: multi-word entries are
+# matched as phrases, 3: upper-case single words are skipped again), so results
+# cached under the lexicon version are rescored
+MATCHING_VERSION = b"3"
+
 # =============================================================================
 # ACTIVE CODE - Currently used functions
 # =============================================================================
 
-# Zacc's Code - Called by reviewMethods functions
-def wordScores():
-    # Always initialize sentimentDict, so it exists even if file fails
-    sentimentDict = {}
+class LexiconError(Exception):
+    """Raised when the sentiment dictionary cannot be read or is malformed"""
+
+
+class Lexicon:
+    """
+    Parsed sentiment dictionary (entry -> score). An entry is a single word or
+    a phrase of several words ("not good", "waste of money", "cover-up"),
+    matched by reviewMethods.get_phrase_matcher.
+    version is a hash of the file contents, so caches of scored results
+    can be keyed on it and are invalidated whenever the dictionary changes.
+    """
+
+    def __init__(self, path, scores, version, mtime_ns):
+        self.path = path
+        self.scores = scores
+        self.version = version
+        self.mtime_ns = mtime_ns
+
+    def __len__(self):
+        return len(self.scores)
+
+    def score(self, word):
+        return self.scores.get(word, 0.0)
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def _read_lexicon(path):
+    """Parse the dictionary csv, raising LexiconError instead of returning an empty dict"""
     try:
-        with open(file_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
-            csv_reader = csv.reader(csvfile)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        raise LexiconError(f"Cannot read sentiment dictionary {path}: {e}") from e
+
+    sentimentDict = {}
+    text = raw.decode('utf-8-sig')
+    csv_reader = csv.reader(text.splitlines())
+    for line_number, row in enumerate(csv_reader, start=1):
+        if not row:
+            continue
+        try:
+            sentimentDict[row[0]] = float(row[1])
+        except (IndexError, ValueError) as e:
+            raise LexiconError(f"{path}, line {line_number}: bad entry {row!r}") from e
+
+    if not sentimentDict:
+        raise LexiconError(f"Sentiment dictionary {path} is empty")
 
-            sentimentDict = {
+    version = hashlib.sha1(raw + MATCHING_VERSION).hexdigest()[:12]
+    return Lexicon(path, sentimentDict, version, mtime_ns)
 
-            }
 
-            for row in csv_reader:
-                sentimentDict[row[0]] = float(row[1])
+# Process-wide lexicon, parsed once and reloaded only when the file's mtime changes
+def get_lexicon():
+    global _lexicon
+    try:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    except OSError as e:
+        raise LexiconError(f"Cannot read sentiment dictionary {file_path}: {e}") from e
+
+    lexicon = _lexicon
+    if lexicon is not None and lexicon.mtime_ns == mtime_ns:
+        return lexicon
+
+    with _lexicon_lock:
+        if _lexicon is None or _lexicon.mtime_ns != mtime_ns:
+            _lexicon = _read_lexicon(file_path)
+        return _lexicon
 
-    except Exception as e:
-        print(e)
 
-    return sentimentDict
\ No newline at end of file
+# Zacc's Code - Called by reviewMethods functions
+# Returns the cached word -> score dict (no longer re-reads the csv on every call)
+def wordScores():
+    return get_lexicon().scores
@@ -0,0 +1,135 @@
+"""
+Text Normalizer
+Precompiled cleaning used by reviewMethods (scoring) and data_to_frontend (display).
+Produces exactly the same text as the old chained re.sub + contractions.fix steps.
+The contractions package and the expansion regex are only loaded on first use.
+"""
+
+import re
+import threading
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+# Sentence boundaries (Ethel's multiple punctuation split)
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+# Everything the scorer does not keep. Hyphens are turned into spaces separately and
+# '.' is kept because it marks the sentence boundaries inside split_sentences
+_DISALLOWED_CHARS = re.compile(r'[^a-zA-Z\d\s:.\-]')
+# Excel carriage-return escapes and newlines, removed in one pass for display text
+_DISPLAY_NOISE = re.compile(r'_x000D_|\n')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _build_contraction_table():
+    """
+    Table of contraction/slang -> expansion, built from the same dictionaries
+    contractions.fix uses (later dictionaries win, like contractions does).
+    Only keys that can still occur after character filtering are kept,
+    so apostrophe forms such as "don't" are covered by their "dont" entry.
+    """
+    import contractions
+    table = {}
+    for source in (contractions.contractions_dict, contractions.leftovers_dict, contractions.slang_dict):
+        for key, value in source.items():
+            table[key.lower()] = value
+    return {key: value for key, value in table.items() if re.fullmatch(r'[a-z\d\s:]+', key)}
+
+
+def _trie_regex(keys):
+    """
+    Regex for a set of literal keys arranged as a trie, so a position that
+    cannot start any key fails after one character instead of after trying
+    every alternative. Longer keys are tried before their prefixes.
+    """
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+_CONTRACTIONS = None            # contraction -> expansion, see _load_contractions
+_CONTRACTION_PATTERN = None
+_contractions_lock = threading.Lock()
+
+
+def _load_contractions():
+    """Build the contraction table and regex once, the first time a review is expanded"""
+    global _CONTRACTIONS, _CONTRACTION_PATTERN
+    with _contractions_lock:
+        if _CONTRACTION_PATTERN is None:
+            table = _build_contraction_table()
+            # Whole-word matches only, with the same word boundaries contractions.fix uses
+            pattern = re.compile(
+                r'\b' + _trie_regex(table) + r'(?![A-Za-z0-9_])',
+                re.IGNORECASE | re.ASCII,
+            )
+            _CONTRACTIONS = table
+            _CONTRACTION_PATTERN = pattern
+    return _CONTRACTION_PATTERN
+
+
+def _sentence_case(word):
+    return word[0].upper() + word[1:].lower()
+
+
+def _match_case(matched, expansion):
+    """Give the expansion the casing of the matched text (as contractions.fix does)"""
+    if matched == matched.upper():
+        return expansion.upper()
+    if matched == matched.title():
+        return expansion.title()
+    if matched == matched.lower():
+        return expansion.lower()
+    if matched == _sentence_case(matched):
+        return _sentence_case(expansion)
+    return expansion
+
+
+def _expand(match):
+    matched = match.group(0)
+    return _match_case(matched, _CONTRACTIONS[matched.lower()])
+
+
+def expand_contractions(text):
+    """Table-driven replacement for contractions.fix on already filtered text"""
+    pattern = _CONTRACTION_PATTERN or _load_contractions()
+    return pattern.sub(_expand, text)
+
+
+# Used by reviewMethods.format_review
+def split_sentences(review):
+    """
+    Split a review into cleaned sentences ready for segmentation:
+    sentence split, hyphens to spaces, drop anything but letters, digits,
+    whitespace and colons, then expand contractions.
+
+    The non-empty sentences are joined back with '.' so filtering and
+    contraction expansion each run once over the whole review instead of
+    once per sentence ('.' can never be inside a sentence or a contraction).
+    """
+    review = review.replace('_x000D_', '')
+    sentences = [sentence for sentence in (part.strip() for part in _SENTENCE_SPLIT.split(review)) if sentence]
+    if not sentences:
+        return []
+    text = _DISALLOWED_CHARS.sub('', '.'.join(sentences)).replace('-', ' ')
+    return expand_contractions(text).split('.')
+
+
+# Used by data_to_frontend.clean_review_text
+def clean_display_text(review_text):
+    """Remove Excel _x000D_ escapes and newlines, then collapse whitespace"""
+    review_text = _DISPLAY_NOISE.sub('', review_text)
+    return _WHITESPACE.sub(' ', review_text).strip()
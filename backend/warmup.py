@@ -0,0 +1,104 @@
+"""
+Warm-up
+Optional pre-warm phase, switched on with SENTIMENT_PREWARM=1.
+Once the server accepts connections, a background thread loads everything the
+first requests would otherwise pay for: the wordsegment corpora, the
+contraction table, the lexicon, pandas/matplotlib and the most recently used
+datasets (with their review_id index and keyword search index).
+Each step's duration is printed and kept in `timings` for /metrics.
+"""
+
+import os
+import socket
+import threading
+import time
+
+import review_index
+import review_store
+import reviewMethods
+import sentiment_dict
+import text_normalizer
+
+ENABLED = os.environ.get("SENTIMENT_PREWARM", "0") == "1"
+# How long to wait for the server to start listening before warming up anyway
+LISTEN_TIMEOUT = 30
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+timings = {}        # step -> seconds, filled in as the warm-up runs
+_started = False
+_start_lock = threading.Lock()
+
+
+def _timed(step, function, *args):
+    start = time.perf_counter()
+    try:
+        function(*args)
+    except Exception as e:
+        # A failed step only means the first request pays for it instead
+        print(f"WARNING: pre-warm step {step} failed: {e}")
+        return
+    timings[step] = time.perf_counter() - start
+    print(f"Pre-warm {step}: {timings[step] * 1000:.0f} ms")
+
+
+def _wait_for_server(host, port, timeout=LISTEN_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _import_pandas():
+    import pandas  # noqa: F401
+
+
+def _import_matplotlib():
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def _load_dataset(app_id):
+    dataset = review_store.get_dataset(app_id)
+    # Builds the review_id -> row index the first /returnReview would otherwise build
+    dataset.row_of(0)
+
+
+def prewarm(app_ids=None):
+    """Load the segmenter, lexicon, heavy libraries and recent datasets, timing each step"""
+    start = time.perf_counter()
+    _timed("segmenter", reviewMethods.load_segmenter)
+    _timed("contractions", text_normalizer._load_contractions)
+    _timed("lexicon", sentiment_dict.get_lexicon)
+    _timed("fast_path_words", reviewMethods._get_fast_path_words)
+    _timed("pandas", _import_pandas)
+    _timed("matplotlib", _import_matplotlib)
+    app_ids = review_store.recent_app_ids() if app_ids is None else app_ids
+    for app_id in app_ids:
+        _timed(f"dataset_{app_id}", _load_dataset, app_id)
+    for app_id in app_ids:
+        _timed(f"search_index_{app_id}", review_index.prepare, app_id)
+    timings["total"] = time.perf_counter() - start
+    print(f"Pre-warm finished in {timings['total'] * 1000:.0f} ms")
+
+
+def start_background(host="127.0.0.1", port=5000):
+    """Run prewarm on a daemon thread once host:port accepts connections (no-op unless enabled)"""
+    global _started
+    with _start_lock:
+        if not ENABLED or _started:
+            return False
+        _started = True
+
+    def run():
+        if not _wait_for_server(host, port):
+            print(f"WARNING: server not listening on {host}:{port} after {LISTEN_TIMEOUT}s, pre-warming anyway")
+        prewarm()
+
+    threading.Thread(target=run, name="prewarm", daemon=True).start()
+    return True
@@ -0,0 +1,243 @@
+"""
+Benchmark Suite
+Times the analysis and data paths on synthetic reviews of controlled length
+(100 to 50,000 characters) and on the bundled dataset, writes the results as
+JSON and fails if any benchmark got slower than the stored baseline allows.
+
+Usage:
+    python benchmarks/run_benchmarks.py                          (compare against benchmarks/baseline.json)
+    python benchmarks/run_benchmarks.py --quick --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline          (after an intended change)
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(BASE_DIR, "..", "backend")))
+
+import pandas as pd
+
+import createSentimentVisualization
+import data_to_frontend
+import review_store
+import reviewMethods
+import sentiment_dict
+
+BASELINE_PATH = os.path.join(BASE_DIR, "baseline.json")
+APP_ID = "315210"
+
+REVIEW_LENGTHS = [100, 1000, 5000, 20000, 50000]
+QUICK_REVIEW_LENGTHS = [100, 1000, 5000]
+# A benchmark fails when its median is more than this fraction slower than the baseline
+DEFAULT_TOLERANCE = 0.25
+# Medians below this many seconds are too noisy to fail on
+MIN_COMPARABLE_SECONDS = 0.002
+SEED = 1002
+# Reviews of the dataset formatted for the lexicon scoring benchmarks (--quick uses fewer)
+SCORING_REVIEWS = None
+QUICK_SCORING_REVIEWS = 2000
+
+# Words for the synthetic reviews: lexicon words carry the scores, glued
+# pairs ("greatgame") and contractions exercise segmentation and expansion
+FILLER_WORDS = ["the", "game", "i", "played", "it", "with", "my", "friends", "and", "story",
+                "combat", "was", "but", "this", "campaign", "graphics", "price", "hours"]
+GLUED_WORDS = ["greatgame", "dontbuy", "worthit", "bossfight", "lovethestory", "endgame"]
+CONTRACTIONS = ["don't", "can't", "it's", "I'm", "wouldn't", "they're"]
+PUNCTUATION = [".", ".", ".", "!", "?", "!!", "..."]
+
+# =============================================================================
+# ACTIVE CODE - Currently used functions
+# =============================================================================
+
+def synthetic_review(length, seed=SEED):
+    """A deterministic review of exactly `length` characters"""
+    rng = random.Random(seed + length)
+    lexicon_words = sorted(word for word in sentiment_dict.wordScores() if word.isalpha())
+    words = []
+    size = 0
+    while size < length:
+        sentence = []
+        for _ in range(rng.randint(5, 18)):
+            pick = rng.random()
+            if pick < 0.25:
+                sentence.append(rng.choice(lexicon_words))
+            elif pick < 0.32:
+                sentence.append(rng.choice(GLUED_WORDS))
+            elif pick < 0.38:
+                sentence.append(rng.choice(CONTRACTIONS))
+            else:
+                sentence.append(rng.choice(FILLER_WORDS))
+        text = " ".join(sentence).capitalize() + rng.choice(PUNCTUATION) + " "
+        words.append(text)
+        size += len(text)
+    return "".join(words)[:length]
+
+
+def _reset_caches():
+    """Start every timed run from the same state (no memoized segmentations)"""
+    reviewMethods._segment_token.cache_clear()
+
+
+def time_call(function, repeats, setup=None):
+    """Run function `repeats` times after one warm-up run and return the timings in seconds"""
+    if setup:
+        setup()
+    function()
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def build_benchmarks(quick=False):
+    """name -> (function, setup, repeats, details)"""
+    reviewMethods.load_segmenter()
+    reviewMethods._get_fast_path_words()
+    benchmarks = {}
+
+    for length in (QUICK_REVIEW_LENGTHS if quick else REVIEW_LENGTHS):
+        review = synthetic_review(length)
+        repeats = 5 if length <= 5000 else 3
+        details = {"chars": length}
+        benchmarks[f"format_review[{length}]"] = (
+            lambda review=review: reviewMethods.format_review(review), _reset_caches, repeats, details)
+        benchmarks[f"sentence_score_calculator[{length}]"] = (
+            lambda review=review: reviewMethods.sentence_score_calculator(review), _reset_caches, repeats, details)
+        benchmarks[f"score_paragraphs_SlidingWindow[{length}]"] = (
+            lambda review=review: reviewMethods.score_paragraphs_SlidingWindow(review), _reset_caches, repeats, details)
+
+    # One long cleaned sentence, so segment_sentence is timed on its own
+    sentence = " ".join(reviewMethods.text_normalizer.split_sentences(synthetic_review(2000)))
+    benchmarks["segment_sentence[2000]"] = (
+        lambda: reviewMethods.segment_sentence(sentence), _reset_caches, 5, {"chars": len(sentence)})
+
+    dataset = review_store.get_dataset(APP_ID)
+    frame = dataset.to_dataframe(columns=['review_id', 'review_text'])
+    benchmarks["data_to_frontend.get_reviews[dataset]"] = (
+        lambda: data_to_frontend.get_reviews(frame), None, 3, {"reviews": len(frame)})
+
+    # Lexicon lookup on already formatted dataset sentences: the old one dict.get per
+    # word against the automaton that also matches multi-word entries
+    texts = dataset.text('review_text')[:QUICK_SCORING_REVIEWS if quick else SCORING_REVIEWS]
+    sentences = [sentence.split() for text in texts if isinstance(text, str)
+                 for sentence in reviewMethods.format_review(text)]
+    word_scores = sentiment_dict.wordScores()
+    matcher = reviewMethods.get_phrase_matcher()
+    details = {"reviews": len(texts), "sentences": len(sentences), "phrases": matcher.phrase_count}
+    # The review count is part of the name, so a --quick run is never compared with a full baseline
+    benchmarks[f"lexicon_scoring[per_word,{len(texts)}]"] = (
+        lambda: [sum(float(word_scores.get(word, 0)) for word in words) for words in sentences], None, 5, details)
+    benchmarks[f"lexicon_scoring[automaton,{len(texts)}]"] = (
+        lambda: [matcher.score(words) for words in sentences], None, 5, details)
+
+    if not quick:
+        source = review_store.source_path(APP_ID)
+        benchmarks["xlsx_load[dataset]"] = (
+            lambda: pd.read_excel(source), None, 1, {"reviews": len(dataset)})
+        benchmarks["visualization_render[preview]"] = (
+            lambda: createSentimentVisualization.create_sentiment_playtime_visualization(
+                APP_ID, dpi=createSentimentVisualization.PREVIEW_DPI), None, 2, {"dpi": createSentimentVisualization.PREVIEW_DPI})
+        benchmarks["visualization_render[full]"] = (
+            lambda: createSentimentVisualization.create_sentiment_playtime_visualization(
+                APP_ID, dpi=createSentimentVisualization.FULL_DPI), None, 1, {"dpi": createSentimentVisualization.FULL_DPI})
+    return benchmarks
+
+
+def run_benchmarks(quick=False, only=None):
+    """Run the suite and return the machine-readable results"""
+    results = {}
+    for name, (function, setup, repeats, details) in build_benchmarks(quick).items():
+        if only and only not in name:
+            continue
+        # The chart renderer prints its insights on every run
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            timings = time_call(function, repeats, setup)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        results[name] = {
+            "median": statistics.median(timings),
+            "min": min(timings),
+            "max": max(timings),
+            "repeats": repeats,
+            **details,
+        }
+        print(f"{name:<45}{results[name]['median'] * 1000:>12.2f} ms")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Names of the benchmarks whose median regressed past the tolerance, with their slowdown"""
+    regressions = {}
+    for name, result in results["results"].items():
+        reference = baseline["results"].get(name)
+        if not reference or max(result["median"], reference["median"]) < MIN_COMPARABLE_SECONDS:
+            continue
+        slowdown = result["median"] / reference["median"] - 1
+        if slowdown > tolerance:
+            regressions[name] = round(slowdown, 3)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review analysis and data paths")
+    parser.add_argument("--quick", action="store_true", help="Only reviews up to 5,000 chars, no xlsx load or chart render")
+    parser.add_argument("--only", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before failing (0.25 = 25%% slower)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, only=args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    missing = [name for name in results["results"] if name not in baseline["results"]]
+    if missing:
+        print(f"Not in the baseline, not compared: {', '.join(missing)}")
+    if regressions:
+        for name, slowdown in regressions.items():
+            print(f"REGRESSION: {name} is {slowdown:.0%} slower than the baseline")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
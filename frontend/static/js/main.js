@@ -85,9 +85,10 @@ async function runSentimentAnalysis(reviewID, appID, originalReviewSection, sent
         return;
     }
     try {
-        // Call from the excel sheet the review ID and display the results
-        const response = await fetch(`/returnReview?review_id=${reviewID}&app_id=${appID}`);
-        const data = await response.json();
+        // Stream the analysis so long reviews show progress (and a partial result if the time budget runs out)
+        const data = await fetchReviewAnalysis(`/returnReview?review_id=${reviewID}&app_id=${appID}&format=ndjson`, (progress) => {
+            originalReviewElement.innerHTML = `<div class="loading-indicator"><span class="loading-hourglass">⧗</span><span>Analyzing sentences... ${progress.sentences_done} / ${progress.sentences_total}</span></div>`;
+        });
         console.log('Received data:', data);
         
         // Update the element with the received data
@@ -104,11 +105,17 @@ async function runSentimentAnalysis(reviewID, appID, originalReviewSection, sent
             let most_positive_paragraph_text = data.most_positive_paragraph_text
 
             // 1. Original Review Content Section
-            originalReviewElement.innerHTML = `
-                <div class="analysis-complete-badge">
+            const completeBadge = data.partial
+                ? `<div class="analysis-complete-badge">
+                    <span class="success-icon">⚠️</span>
+                    <strong>Partial result: time limit reached after ${data.sentences_analyzed} of ${data.sentences_total} sentences</strong>
+                </div>`
+                : `<div class="analysis-complete-badge">
                     <span class="success-icon">✅</span>
                     <strong>Analysis Complete!</strong>
-                </div>
+                </div>`;
+            originalReviewElement.innerHTML = `
+                ${completeBadge}
                 <div class="review-content-display">
                     <h4 class="content-subtitle">📄 Complete Review Text</h4>
                     <div class="review-text-container">
@@ -221,6 +228,36 @@ async function runSentimentAnalysis(reviewID, appID, originalReviewSection, sent
     }
 }
 
+// Read /returnReview's NDJSON stream: progress lines go to onProgress, the result line is returned
+async function fetchReviewAnalysis(url, onProgress) {
+    const response = await fetch(url);
+    // Errors found before the analysis starts (bad ids etc.) come back as plain JSON
+    if (!(response.headers.get('Content-Type') || '').includes('ndjson')) {
+        return await response.json();
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const message = JSON.parse(line);
+            if (message.event === 'progress') {
+                onProgress(message);
+            } else {
+                return message;
+            }
+        }
+        if (done) {
+            return { error: 'Analysis stream ended without a result' };
+        }
+    }
+}
+
 // =============================================================================
 // INDEX.HTML FUNCTIONS - Summary Visualization (Team Collaboration)
 // =============================================================================
@@ -243,13 +280,9 @@ async function runSummarizeReviews() {
     vizImg.style.display = 'none';
 
     try {
-        console.log("Before const response")
-        const response = await fetch(`/summaryVisualisation?app_id=${appId}`);
-        console.log(response)
-        console.log("After const response")
+        // Only the playtime bin numbers come from the server, the charts are drawn here
+        const response = await fetch(`/summaryStats?app_id=${appId}`);
         const data = await response.json();
-        console.log(data)
-
         if (data.error) {
             status.innerHTML = '❌ ' + data.error;
             contentDiv.innerHTML = '';
@@ -257,30 +290,110 @@ async function runSummarizeReviews() {
         }
 
         status.innerHTML = '✅ Summary complete!';
+        contentDiv.innerHTML = `<p><strong>Total Reviews:</strong> ${data.total_reviews.toLocaleString()} | <strong>Overall Recommended:</strong> ${(data.overall_positive_ratio * 100).toFixed(1)}%</p>`;
 
-         // 1. Create the image element
-        const newImage = document.createElement("img");
-
-        // 2. Set the image source
-        newImage.src = "../static/css/sentiment_playtime_analysis.png";
-
-        // 3. Set the alt text and style for accessibility and viewing
-        newImage.alt = "A summary of the Steam Reviews";
-        
-        newImage.style.width = "1000px"
-
-        // 4. Get the container element where you want to add the image
+        const labels = data.bins.map(bin => bin.playtime_bin);
+        const ratios = data.bins.map(bin => bin.positive_ratio);
+        const counts = data.bins.map(bin => bin.review_count);
+        const positiveCounts = data.bins.map(bin => bin.positive_count);
+        const negativeCounts = data.bins.map(bin => bin.negative_count);
         const container = document.getElementById("imageContainer");
-
-        // 5. Append the image to the container
-        if (!container.hasChildNodes()) {
-        container.appendChild(newImage)};
-
-        contentDiv.innerHTML = "";
+        container.innerHTML =
+            drawBarChart('Recommended Ratio by Playtime', labels, ratios, {
+                maxValue: 1,
+                threshold: 0.5,
+                colors: ratios.map(ratio => ratio < 0.5 ? '#ff6b6b' : '#51cf66'),
+                format: value => value.toFixed(3)
+            }) +
+            drawBarChart('Number of Reviews by Playtime', labels, counts, {
+                colors: counts.map(() => 'skyblue'),
+                format: value => Math.round(value).toLocaleString()
+            }) +
+            drawLineChart('Recommended Ratio Across Playtime Categories', labels, ratios, {
+                maxValue: 1,
+                threshold: 0.5,
+                format: value => value.toFixed(3)
+            }) +
+            drawBarChart('Review Distribution: Positive vs Negative', labels, positiveCounts, {
+                colors: positiveCounts.map(() => '#51cf66'),
+                stacked: { values: negativeCounts, color: '#ff6b6b' },
+                legend: [['Positive Reviews', '#51cf66'], ['Negative Reviews', '#ff6b6b']],
+                maxValue: Math.max(1, ...counts) * 1.1,
+                format: value => Math.round(value).toLocaleString()
+            });
 
     } catch (error) {
         status.innerHTML = '❌ Error running summary!';
         contentDiv.innerHTML = '<p style="color: #e74c3c;">❌ Failed to load summary</p>';
         console.error(error);
     }
-}
\ No newline at end of file
+}
+
+// Draw a labelled SVG bar chart (one bar per playtime bin)
+// options.stacked = { values, color } puts a second series on top of each bar
+function drawBarChart(title, labels, values, options) {
+    const chart = chartFrame(title, labels, values, options);
+    const { slot, y, baseline } = chart;
+    let svg = chart.svg;
+    values.forEach((value, index) => {
+        const x = chart.left + index * slot + slot * 0.15;
+        svg += `<rect x="${x}" y="${y(value)}" width="${slot * 0.7}" height="${baseline - y(value)}" fill="${options.colors[index]}" stroke="#333" stroke-width="1"/>`;
+        let top = value;
+        if (options.stacked) {
+            top = value + options.stacked.values[index];
+            svg += `<rect x="${x}" y="${y(top)}" width="${slot * 0.7}" height="${y(value) - y(top)}" fill="${options.stacked.color}" stroke="#333" stroke-width="1"/>`;
+        }
+        svg += `<text x="${x + slot * 0.35}" y="${y(top) - 4}" text-anchor="middle" font-size="10" font-weight="bold">${options.format(top)}</text>`;
+    });
+    return svg + chartAxes(chart, options) + '</svg>';
+}
+
+// Draw a labelled SVG line chart through one point per playtime bin
+function drawLineChart(title, labels, values, options) {
+    const chart = chartFrame(title, labels, values, options);
+    const { slot, y } = chart;
+    const points = values.map((value, index) => [chart.left + index * slot + slot * 0.5, y(value)]);
+    let svg = chart.svg;
+    svg += `<polyline points="${points.map(point => point.join(',')).join(' ')}" fill="none" stroke="purple" stroke-width="4"/>`;
+    points.forEach(([x, pointY], index) => {
+        svg += `<circle cx="${x}" cy="${pointY}" r="6" fill="white" stroke="purple" stroke-width="3"/>`;
+        svg += `<text x="${x}" y="${pointY - 10}" text-anchor="middle" font-size="10" font-weight="bold">${options.format(values[index])}</text>`;
+    });
+    return svg + chartAxes(chart, options) + '</svg>';
+}
+
+// Title, x axis and bin labels shared by the summary charts
+function chartFrame(title, labels, values, options) {
+    const width = 480, height = 300, left = 50, bottom = 60, top = 40;
+    const plotHeight = height - top - bottom;
+    const maxValue = options.maxValue || Math.max(1, ...values) * 1.1;
+    const slot = (width - left - 10) / Math.max(1, values.length);
+    const y = value => top + plotHeight - (value / maxValue) * plotHeight;
+    const baseline = top + plotHeight;
+
+    let svg = `<svg class="summary-chart" viewBox="0 0 ${width} ${height}" width="${width}" height="${height}" role="img" aria-label="${title}">`;
+    svg += `<text x="${width / 2}" y="22" text-anchor="middle" font-weight="bold" font-size="15">${title}</text>`;
+    svg += `<line x1="${left}" y1="${baseline}" x2="${width - 10}" y2="${baseline}" stroke="#333"/>`;
+    labels.forEach((label, index) => {
+        const x = left + index * slot + slot * 0.5;
+        svg += `<text x="${x}" y="${baseline + 14}" text-anchor="end" font-size="10" transform="rotate(-45 ${x} ${baseline + 14})">${label}</text>`;
+    });
+    return { svg, width, left, top, slot, y, baseline, maxValue };
+}
+
+// Threshold line, y axis labels and legend drawn over the plotted data
+function chartAxes(chart, options) {
+    const { width, left, top, y, baseline, maxValue } = chart;
+    let svg = '';
+    if (options.threshold !== undefined) {
+        svg += `<line x1="${left}" y1="${y(options.threshold)}" x2="${width - 10}" y2="${y(options.threshold)}" stroke="black" stroke-dasharray="6 4" opacity="0.7"/>`;
+    }
+    (options.legend || []).forEach(([name, color], index) => {
+        const legendY = top + index * 16;
+        svg += `<rect x="${width - 130}" y="${legendY - 9}" width="10" height="10" fill="${color}"/>`;
+        svg += `<text x="${width - 115}" y="${legendY}" font-size="10">${name}</text>`;
+    });
+    svg += `<text x="${left - 6}" y="${top + 4}" text-anchor="end" font-size="10">${options.format(maxValue)}</text>`;
+    svg += `<text x="${left - 6}" y="${baseline}" text-anchor="end" font-size="10">0</text>`;
+    return svg;
+}
@@ -4,9 +4,14 @@
 import sys
 import os
 import datetime
+import json
+import time
 import webbrowser
 from threading import Timer
-from flask import Flask, jsonify, render_template, request
+
+# Startup timings are reported once the backend modules are loaded
+_import_start = time.perf_counter()
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 from logging import FileHandler,WARNING
 
 # -----------------------------
@@ -14,9 +19,21 @@ from logging import FileHandler,WARNING
 # -----------------------------
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'backend')))
 
-from backend import reviewMethods
-from backend import createSentimentVisualization
-from backend import data_to_frontend
+# Backend modules are imported by their top-level name, the same way they import
+# each other, so main.py shares their caches instead of loading second copies
+import createSentimentVisualization
+import data_to_frontend
+import bulk_scoring
+import review_store
+import reviewMethods
+import sentiment_dict
+import analysis_cache
+import aggregate_store
+import review_index
+import jobs
+import metrics
+import warmup
+IMPORT_SECONDS = time.perf_counter() - _import_start
 
 # -----------------------------
 # Flask app initialization
@@ -27,6 +44,15 @@ static_dir = os.path.join(os.path.dirname(__file__), 'frontend', 'static')
 app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
 file_handler = FileHandler('errorlog.txt')
 file_handler.setLevel(WARNING)
+# Per-route latency histograms and stage spans (SENTIMENT_METRICS=0 turns them off)
+metrics.init_app(app)
+
+# Parse the sentiment dictionary once at startup (raises if it is missing or malformed)
+lexicon = sentiment_dict.get_lexicon()
+print(f"Loaded sentiment dictionary: {len(lexicon)} words, version {lexicon.version}")
+# pandas, matplotlib and the segmenter corpora are loaded on first use (or by the pre-warm)
+print(f"Imported Flask and backend modules in {IMPORT_SECONDS * 1000:.0f} ms"
+      f" (pre-warm {'on' if warmup.ENABLED else 'off, set SENTIMENT_PREWARM=1 to enable'})")
 
 # -----------------------------
 # Routes
@@ -55,92 +81,137 @@ def reviewAnalyser():
                            review_id=review_id,
                            app_id=app_id)
 
+# Reviews longer than this are analysed in sentence batches under a time budget
+LONG_REVIEW_CHARS = 10000
+# Seconds a long review may take before a partial result is returned (time_budget overrides it)
+DEFAULT_TIME_BUDGET = 20.0
+MAX_TIME_BUDGET = 300.0
+
+def _review_response(result, analysis):
+    """The /returnReview JSON body for an analysis (analyze_review or analyze_review_progressive)"""
+    scored_paragraphs = analysis["scored_paragraphs"]
+    # Extract most positive (first) and most negative (last) paragraphs
+    positivePara = scored_paragraphs[0] if scored_paragraphs else None
+    negativePara = scored_paragraphs[-1] if scored_paragraphs else None
+
+    # Convert numpy int64 to regular int for JSON serialization
+    response = {
+        "review_id": int(result["review_id"]),
+        "review_text": result["review_text"],
+        "sentence_score": analysis["sentence_score"],
+        "sorted_sentence_score": analysis["sorted_sentence_score"],
+        "most_positive_paragraph_score": positivePara["raw_score"] if positivePara and "raw_score" in positivePara else 0,
+        "most_positive_paragraph_text": positivePara["paragraph"] if positivePara and "paragraph" in positivePara else "No positive paragraph found",
+        "most_negative_paragraph_text": negativePara["paragraph"] if negativePara and "paragraph" in negativePara else "No negative paragraph found",
+        "most_negative_paragraph_score": negativePara["raw_score"] if negativePara and "raw_score" in negativePara else 0,
+        "partial": analysis.get("partial", False),
+    }
+    if response["partial"]:
+        # Only the first sentences_analyzed sentences were scored before the time budget ran out
+        response["sentences_analyzed"] = analysis["sentences_analyzed"]
+        response["sentences_total"] = analysis["sentences_total"]
+    return response
+
+
+def _stream_event(event, payload, stream_format):
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+
 @app.route("/returnReview", methods=["GET"]) # Edited by Mus
 def returnReview():
+    """
+    Sentence and sliding window analysis of one review.
+    format=ndjson or format=sse streams progress events (sentences scored so far,
+    best and worst window so far) and then the result. Reviews over
+    LONG_REVIEW_CHARS, and every streamed request, stop after time_budget seconds
+    with a result marked "partial": true.
+    """
     # Get parameters from request args
     review_id = request.args.get('review_id')
     app_id = request.args.get('app_id')
-    
-    print(f"DEBUG: Received review_id={review_id}, app_id={app_id}")
+    window_size = request.args.get('window_size', default=5, type=int)
+    step_size = request.args.get('step_size', default=1, type=int)
+    stream_format = request.args.get('format', default='json')
+    time_budget = request.args.get('time_budget', default=DEFAULT_TIME_BUDGET, type=float)
     
     if not review_id or not app_id:
         return jsonify({"error": "Missing review_id or app_id parameter"}), 400
+    if window_size < 1 or step_size < 1:
+        return jsonify({"error": "window_size and step_size must be at least 1"}), 400
+    if stream_format not in ("json", "ndjson", "sse"):
+        return jsonify({"error": "format must be json, ndjson or sse"}), 400
+    if not 0 < time_budget <= MAX_TIME_BUDGET:
+        return jsonify({"error": f"time_budget must be between 0 and {MAX_TIME_BUDGET:g} seconds"}), 400
     
     try:
         # Convert review_id to integer
         review_id = int(review_id)
-        print(f"DEBUG: Converted review_id to int: {review_id}")
-        
-        # Get the file path
-        file_id = f'steam_reviews_{app_id}.xlsx'
-        file_path = os.path.join(BASE_DIR, "data", file_id)
-        print(f"DEBUG: Looking for file: {file_path}")
-        
-        outputList = data_to_frontend.get_reviews()
-        print(f"DEBUG: Found {len(outputList)} reviews")
-        print(f"DEBUG: First few review IDs: {[item['review_id'] for item in outputList[:3]]}")
 
-        # Find the specific review
-        # Run through the list of dicts to find the one with matching review_id
-        result = next((item for item in outputList if int(item["review_id"]) == review_id), None)
-        print(f"DEBUG: Found result: {result is not None}")
+        with metrics.span("load"):
+            review_store.get_dataset(app_id)
+        
+        # Constant-time lookup through the app's review_id index (no full scan)
+        with metrics.span("lookup"):
+            result = data_to_frontend.get_review(app_id, review_id)
 
         if result is None:
             return jsonify({"error": f"Review ID '{review_id}' not found"}), 404
-            
-        print(f"DEBUG: Processing review text for sentiment analysis...")
+
+        # Serve a previously built response if neither the review text nor the lexicon changed
+        with metrics.span("cache"):
+            cache_key = analysis_cache.make_key(app_id, review_id, result["review_text"],
+                                                sentiment_dict.get_lexicon().version, window_size, step_size)
+            cached_result = analysis_cache.result_cache.get(cache_key)
+        metrics.annotate("analysis_cache", "hit" if cached_result is not None else "miss")
+
+        if stream_format != "json":
+            mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+            # The analysis runs while the body is sent, after after_request, so the
+            # request's trace is kept open until the stream ends
+            body = metrics.traced_stream(_stream_analysis(result, cached_result, cache_key, window_size,
+                                                          step_size, time_budget, stream_format))
+            return Response(stream_with_context(body), mimetype=mimetype)
+
+        if cached_result is not None:
+            with metrics.span("serialize"):
+                return jsonify(cached_result)
         
         # Get Sentence Score
         sentence_to_score = result["review_text"]
         review_length = len(sentence_to_score)
-        print(f"DEBUG: Review text length: {review_length}")
-        
-        # For extremely long reviews (>10000 chars), offer smart truncation
-        if review_length > 10000:
-            print(f"WARNING: Very long review detected ({review_length} chars). Consider truncation for speed.")
-            # Optionally truncate to first 8000 characters for speed
-            # sentence_to_score = sentence_to_score[:8000] + "... [truncated for performance]"
+        metrics.annotate("review_chars", review_length)
         
-        # Use optimized analysis functions (original algorithms by Zacc, Ethel, and Mus - performance enhanced)
+        # Single-pass analysis: the review is formatted once and shared by the sentence
+        # and sliding window scoring (original algorithms by Zacc, Ethel, and Mus)
+        # (timed as the normalize, segment, sentence_score and window_score stages)
         try:
-            sentence_score, sorted_sentence_score = reviewMethods.sentence_score_calculator(sentence_to_score)
-            print(f"DEBUG: Optimized sentence analysis complete")
+            if review_length > LONG_REVIEW_CHARS:
+                # Very long reviews are scored in sentence batches and stop at the time budget
+                *_, analysis = reviewMethods.analyze_review_progressive(
+                    sentence_to_score, window_size=window_size, step_size=step_size, time_budget=time_budget)
+                metrics.annotate("partial", analysis["partial"])
+            else:
+                # Only the most positive and most negative windows are shown, so select just those
+                analysis = reviewMethods.analyze_review(sentence_to_score, window_size=window_size,
+                                                        step_size=step_size, top_k=1)
         except Exception as e:
-            print(f"ERROR in sentence_score_calculator: {e}")
-            return jsonify({"error": f"Sentence analysis failed: {str(e)}"}), 500
+            print(f"ERROR in analyze_review: {e}")
+            return jsonify({"error": f"Review analysis failed: {str(e)}"}), 500
 
-        try:
-            # Get Paragraph Score using optimized Sliding Window (Mus's algorithm, performance enhanced)
-            scored_paragraphs = reviewMethods.score_paragraphs_SlidingWindow(sentence_to_score)
-            print(f"DEBUG: Optimized paragraph analysis complete, found {len(scored_paragraphs)} paragraphs")
-        except Exception as e:
-            print(f"ERROR in score_paragraphs_SlidingWindow: {e}")
-            return jsonify({"error": f"Paragraph analysis failed: {str(e)}"}), 500
-
-        # Extract most positive (first) and most negative (last) paragraphs
-        positivePara = scored_paragraphs[0] if scored_paragraphs else None
-        negativePara = scored_paragraphs[-1] if scored_paragraphs else None
-
-        print(f"DEBUG: Positive para keys: {positivePara.keys() if positivePara else 'None'}")
-        print(f"DEBUG: Negative para keys: {negativePara.keys() if negativePara else 'None'}")
-
-        # Convert numpy int64 to regular int for JSON serialization
-        json_safe_result = {
-            "review_id": int(result["review_id"]),
-            "review_text": result["review_text"],
-            "sentence_score": sentence_score,
-            "sorted_sentence_score": sorted_sentence_score,
-            "most_positive_paragraph_score": positivePara["raw_score"] if positivePara and "raw_score" in positivePara else 0,
-            "most_positive_paragraph_text": positivePara["paragraph"] if positivePara and "paragraph" in positivePara else "No positive paragraph found",
-            "most_negative_paragraph_text": negativePara["paragraph"] if negativePara and "paragraph" in negativePara else "No negative paragraph found",
-            "most_negative_paragraph_score": negativePara["raw_score"] if negativePara and "raw_score" in negativePara else 0
-        }
-
-        return jsonify(json_safe_result)
+        with metrics.span("serialize"):
+            json_safe_result = _review_response(result, analysis)
+            # Partial results are not cached, the next request gets another try at the whole review
+            if not json_safe_result["partial"]:
+                analysis_cache.result_cache.put(cache_key, json_safe_result)
+            return jsonify(json_safe_result)
         
     except ValueError as ve:
         print(f"ValueError: {ve}")
         return jsonify({"error": "Invalid review_id format"}), 400
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
     except Exception as e:
         print(f"Error getting review data: {e}")
         import traceback
@@ -148,16 +219,84 @@ def returnReview():
         return jsonify({"error": "Error loading review text"}), 500
 
 
+def _stream_analysis(result, cached_result, cache_key, window_size, step_size, time_budget, stream_format):
+    """Progress events for each sentence batch, then a "result" event (or an "error" event)"""
+    if cached_result is not None:
+        yield _stream_event("result", cached_result, stream_format)
+        return
+    try:
+        for update in reviewMethods.analyze_review_progressive(
+                result["review_text"], window_size=window_size, step_size=step_size, time_budget=time_budget):
+            if not update["done"]:
+                yield _stream_event("progress", {key: value for key, value in update.items() if key != "done"},
+                                    stream_format)
+        with metrics.span("serialize"):
+            response = _review_response(result, update)
+    except Exception as e:
+        print(f"ERROR in analyze_review_progressive: {e}")
+        metrics.annotate("error", f"Review analysis failed: {str(e)}")
+        yield _stream_event("error", {"error": f"Review analysis failed: {str(e)}"}, stream_format)
+        return
+    metrics.annotate("partial", response["partial"])
+    if not response["partial"]:
+        analysis_cache.result_cache.put(cache_key, response)
+    yield _stream_event("result", response, stream_format)
+
+
+# Largest page for a normal JSON response, and for a streamed NDJSON one
+MAX_PAGE_SIZE = 1000
+MAX_STREAM_PAGE_SIZE = 100000
+
 @app.route("/getReviews", methods=["GET"])
 def get_reviewsMain():
+    """
+    Random sample of `limit` reviews (default: 10), or the page of `limit` reviews
+    starting at `offset` when offset is given. Optional filters: recommended=0/1, language, min_playtime and max_playtime (hours).
+    format=ndjson streams the page one review per line.
+    """
     # Extract app_id from query parameter
     app_id = request.args.get("app_id")
     if not app_id:
         return jsonify({"error": "Missing required query parameter: app_id"}), 400
-    else:
-        file_id = f'steam_reviews_{app_id}.xlsx'
-        file_path = os.path.join(BASE_DIR, "data", file_id)
-        reviewList = data_to_frontend.get_all_reviews(file_path)
+
+    # limit alone only sizes the sample, paging needs an offset
+    paged = "offset" in request.args
+    stream = request.args.get("format") == "ndjson"
+    offset = request.args.get("offset", default=0, type=int)
+    limit = request.args.get("limit", default=data_to_frontend.SAMPLE_SIZE, type=int)
+    max_limit = MAX_STREAM_PAGE_SIZE if stream else MAX_PAGE_SIZE
+    if offset < 0 or not 1 <= limit <= max_limit:
+        return jsonify({"error": f"offset must be at least 0 and limit between 1 and {max_limit}"}), 400
+
+    filters = {
+        "recommended": request.args.get("recommended", type=int),
+        "language": request.args.get("language"),
+        "min_playtime": request.args.get("min_playtime", type=float),
+        "max_playtime": request.args.get("max_playtime", type=float),
+    }
+    try:
+        dataset, matching, rows = data_to_frontend.select_rows(app_id, offset=offset, limit=limit,
+                                                               sample=not paged, **filters)
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+
+    page_info = {
+        "app_id": app_id,
+        "matching_reviews": matching,
+        "offset": offset if paged else None,
+        "limit": limit,
+        "filters": {key: value for key, value in filters.items() if value is not None},
+    }
+
+    if stream:
+        # First line describes the page, then one review per line, decoded in small batches
+        def generate():
+            yield json.dumps(page_info) + "\n"
+            for review in data_to_frontend.iter_reviews(dataset, rows):
+                yield json.dumps(review) + "\n"
+        return Response(stream_with_context(metrics.traced_stream(generate())), mimetype="application/x-ndjson")
+
+    reviewList = data_to_frontend.reviews_at(dataset, rows)
 
     # Build JSON response
     result = {
@@ -165,27 +304,66 @@ def get_reviewsMain():
         "total_reviews": len(reviewList),
         "review_id": [int(review["review_id"]) for review in reviewList], # add review_id list, convert to int
         "reviews": [str(review["review_text"]) for review in reviewList], # add review text list
-        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    #    "most_positive_paragraphs": positive,
-    #    "most_negative_paragraphs": negative,
-    #    "visualization_path": "output/sentiment_playtime_analysis.png"
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **page_info,
     }
 
     return jsonify(result)
 
 
+@app.route("/searchReviews", methods=["GET"])
+def searchReviews():
+    """
+    Boolean keyword query over an app's reviews (q=crash OR performance).
+    Returns the matching review ids (offset/limit) plus the lexicon score,
+    recommended ratio and playtime breakdown of every match.
+    While the app's index is still being built: 202 with the job building it, poll again.
+    """
+    app_id = request.args.get("app_id")
+    query = request.args.get("q", "").strip()
+    if not app_id or not query:
+        return jsonify({"error": "Missing required query parameters: app_id and q"}), 400
+    offset = request.args.get("offset", default=0, type=int)
+    limit = request.args.get("limit", default=100, type=int)
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"offset must be at least 0 and limit between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    try:
+        if not review_index.is_ready(app_id):
+            # Indexing and scoring every review takes seconds, a job does it off the request thread
+            job, _ = jobs.get_manager().submit_scoring(app_id)
+            return jsonify({"app_id": app_id, "status": "indexing", "job": job}), 202
+        with metrics.span("search"):
+            result = review_index.search(app_id, query, offset=offset, limit=limit)
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+    except jobs.JobQueueFull as e:
+        return jsonify({"error": f"Too many jobs waiting, try again later ({e})"}), 503
+    return jsonify(result)
+
+
 @app.route("/summaryVisualisation", methods=["GET"])
 def summaryVisualisation():
     result = {"output": ""}
     # Extract app_id from query parameter
     app_id = request.args.get("app_id", type=int)
+    preview = request.args.get("preview", default=0, type=int)
     if not app_id:
         return jsonify({"error": "Missing required query parameter: app_id"}), 400
-    else:
-        file_id = f'steam_reviews_{app_id}.xlsx'
-        file_path = os.path.join(BASE_DIR, "data", file_id)
-        output = createSentimentVisualization.create_sentiment_playtime_visualization(file_path)
-        
+    try:
+        # Cached charts are served at once, missing ones are rendered in the background
+        output = createSentimentVisualization.request_chart(app_id, preview=bool(preview))
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+    except createSentimentVisualization.ChartRenderError as e:
+        # The last render failed, polling again would only queue it again
+        return jsonify({"error": str(e)}), 500
+    if output is None:
+        # Still rendering, the browser polls again
+        return jsonify([{"status": "rendering", "preview": bool(preview)}]), 202
+
         # Show the plot
         # plt.show()
         
@@ -197,6 +375,8 @@ def summaryVisualisation():
 
     # 8️⃣ Build JSON response
     result = [{
+        "status": "ready",
+        "preview": bool(preview),
         "output_path": output
     }]
     #    "app_id": app_id,
@@ -209,6 +389,169 @@ def summaryVisualisation():
 
     return jsonify(result)
 
+
+@app.route("/summaryStats", methods=["GET"])
+def summaryStats():
+    """Playtime bin numbers behind the summary charts, drawn by the browser"""
+    app_id = request.args.get("app_id", type=int)
+    if not app_id:
+        return jsonify({"error": "Missing required query parameter: app_id"}), 400
+    try:
+        # Precomputed once per dataset version and stored next to the data
+        result = createSentimentVisualization.get_playtime_stats(app_id)
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+    return jsonify(result)
+
+
+@app.route("/sentimentTrend", methods=["GET"])
+def sentimentTrend():
+    """Rolling recommended ratios (default 7 and 30 days) from the incremental daily aggregates"""
+    app_id = request.args.get("app_id", type=int)
+    days = request.args.get("days", default=90, type=int)
+    windows = request.args.get("windows", default="7,30")
+    if not app_id:
+        return jsonify({"error": "Missing required query parameter: app_id"}), 400
+    try:
+        windows = [int(window) for window in windows.split(",")]
+    except ValueError:
+        return jsonify({"error": "windows must be a comma separated list of days"}), 400
+    if days < 1 or any(window < 1 for window in windows):
+        return jsonify({"error": "days and windows must be at least 1"}), 400
+    try:
+        trend = aggregate_store.rolling_ratios(app_id, windows=windows, days=days)
+        aggregates = aggregate_store.get_aggregates(app_id)
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+
+    result = {
+        "app_id": app_id,
+        "total": aggregates["total"],
+        "playtime_bins": aggregates["playtime_bins"],
+        "last_day": trend["last_day"],
+        "windows": trend["windows"],
+        "updated": aggregates["updated"],
+    }
+    return jsonify(result)
+
+
+@app.route("/bulkScores", methods=["GET"])
+def bulkScores():
+    """
+    Lexicon scores for every review of an app, compared against the recommended flag.
+    Scores that are not ready yet are computed by a score job: 202 with the job, poll again.
+    """
+    app_id = request.args.get("app_id", type=int)
+    include_rows = request.args.get("rows", default=0, type=int)
+    if not app_id:
+        return jsonify({"error": "Missing required query parameter: app_id"}), 400
+    try:
+        scores = bulk_scoring.load_dataset_scores(app_id)
+        if scores is None:
+            # Scoring every review takes seconds, the job does it off the request thread
+            job, _ = jobs.get_manager().submit_scoring(app_id)
+            return jsonify({"app_id": app_id, "status": "scoring", "job": job}), 202
+    except FileNotFoundError:
+        return jsonify({"error": f"No review data found for app_id '{app_id}'"}), 404
+    except jobs.JobQueueFull as e:
+        return jsonify({"error": f"Too many jobs waiting, try again later ({e})"}), 503
+
+    result = {
+        "app_id": app_id,
+        "summary": bulk_scoring.compare_with_recommended(scores),
+        "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if include_rows:
+        # NaN (reviews without sentences) becomes null in the JSON
+        result["reviews"] = scores.astype(object).where(scores.notna(), None).to_dict(orient="records")
+    return jsonify(result)
+
+# -----------------------------
+# Background jobs (fetch -> DataFrame -> workbook), run on jobs' worker pool
+# -----------------------------
+@app.route("/jobs", methods=["POST"])
+def submitJob():
+    """
+    Queue an ingest job for app_id (optional language, day_range, num_per_page).
+    A second submission for an app whose job is still queued or running returns that job.
+    """
+    app_id = request.values.get("app_id")
+    if not app_id or not app_id.isdigit():
+        return jsonify({"error": "app_id must be a Steam app id"}), 400
+    day_range = request.values.get("day_range", type=int)
+    num_per_page = request.values.get("num_per_page", type=int)
+    if (day_range is not None and not 1 <= day_range <= 365) or (num_per_page is not None and not 1 <= num_per_page <= 100):
+        return jsonify({"error": "day_range must be between 1 and 365 and num_per_page between 1 and 100"}), 400
+
+    try:
+        job, collapsed = jobs.get_manager().submit_ingest(app_id, language=request.values.get("language"),
+                                                          day_range=day_range, num_per_page=num_per_page)
+    except jobs.JobQueueFull as e:
+        return jsonify({"error": f"Too many jobs waiting, try again later ({e})"}), 503
+    return jsonify({"job": job, "collapsed": collapsed}), 200 if collapsed else 202
+
+
+@app.route("/jobs", methods=["GET"])
+def listJobs():
+    """Most recent jobs first (limit, default 50)"""
+    limit = request.args.get("limit", default=50, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    return jsonify({"jobs": jobs.get_manager().list_jobs(limit=limit)})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def jobStatus(job_id):
+    """Status, progress (stage, pages, reviews_fetched) and result of one job"""
+    job = jobs.get_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"No job with id '{job_id}'"}), 404
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancelJob(job_id):
+    """Cancel a queued job now, or a running one after its current page"""
+    job = jobs.get_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"No job with id '{job_id}'"}), 404
+    if job["status"] not in jobs.ACTIVE_STATES + (jobs.CANCELLED,):
+        return jsonify({"error": f"Job already {job['status']}", "job": job}), 409
+    return jsonify(job)
+
+
+# Cache counters are read from the caches' own stats when /metrics is scraped
+def _cache_events():
+    analysis = analysis_cache.result_cache.stats()
+    segmentation = reviewMethods.segmentation_stats()
+    return {
+        ("analysis", "hit"): analysis["hits"],
+        ("analysis", "disk_hit"): analysis["disk_hits"],
+        ("analysis", "miss"): analysis["misses"],
+        ("analysis", "disk_eviction"): analysis["disk_evictions"],
+        ("segmentation", "fast_path"): segmentation["fast_path_hits"],
+        ("segmentation", "hit"): segmentation["cache_hits"],
+        ("segmentation", "miss"): segmentation["cache_misses"],
+    }
+
+metrics.CallbackMetric("sentiment_cache_events_total", "Cache lookups by cache and result", "counter",
+                       _cache_events, ("cache", "result"))
+metrics.CallbackMetric("sentiment_cache_entries", "Entries currently held by each cache", "gauge",
+                       lambda: {("analysis",): analysis_cache.result_cache.stats()["entries"],
+                                ("segmentation",): reviewMethods.segmentation_stats()["cache_size"]},
+                       ("cache",))
+metrics.CallbackMetric("sentiment_startup_seconds", "Import time and the duration of each pre-warm step", "gauge",
+                       lambda: {("import",): round(IMPORT_SECONDS, 6),
+                                **{(f"prewarm_{step}",): round(seconds, 6) for step, seconds in warmup.timings.items()}},
+                       ("phase",))
+
+
+@app.route("/metrics", methods=["GET"])
+def metricsEndpoint():
+    """Prometheus text format scrape endpoint"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 def open_browser():
       webbrowser.open_new("http://127.0.0.1:5000")
 
@@ -217,4 +560,9 @@ def open_browser():
 # -----------------------------
 if __name__ == "__main__":
     Timer(1, open_browser).start()
+    # Loads the segmenter, lexicon and recent datasets once the server is listening
+    warmup.start_background(port=5000)
+    # Ingest jobs cut short by the last shutdown carry on from their saved cursor
+    for job in jobs.get_manager().resume_interrupted():
+        print(f"Resumed interrupted ingest of app {job['app_id']} as job {job['job_id']}")
     app.run(port=5000)
\ No newline at end of file
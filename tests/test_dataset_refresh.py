@@ -0,0 +1,145 @@
+"""
+Incremental refresh of a stored dataset (dataset_refresh.refresh_dataset),
+run in a temporary data directory against the local Steam stand-in.
+
+Run with:  python -m pytest tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+import numpy as np
+
+import aggregate_store
+import bulk_scoring
+import dataset_refresh
+import fetch_steam_data
+import review_store
+from test_fetch_steam_data import StandInSteam, _page
+
+APP_ID = "440"
+TEXTS = ["great game, really fun", "not good at all", "boring and broken", "best game ever made",
+         "bad performance but fun", "love it"]
+
+
+def _raw_review(number, text):
+    return {
+        "recommendationid": str(205135180 + number),
+        "author": {"steamid": str(76561198000000000 + number), "num_games_owned": 10, "num_reviews": 2,
+                   "playtime_at_review": 60 * number},
+        "language": "english",
+        "timestamp_created": 1700000000 + number * 3600,
+        "voted_up": number % 2 == 0,
+        "votes_up": 0,
+        "votes_funny": 0,
+        "comment_count": 0,
+        "steam_purchase": True,
+        "received_for_free": False,
+        "weighted_vote_score": "0.5",
+        "review": text,
+    }
+
+
+class RefreshDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        store_dir = os.path.join(data_dir, "columnar")
+        for target, name, value in [
+            (review_store, "DATA_DIR", data_dir),
+            (review_store, "STORE_DIR", store_dir),
+            (review_store, "RECENT_FILE", os.path.join(store_dir, "recent.json")),
+            (aggregate_store, "AGGREGATES_DIR", os.path.join(data_dir, "aggregates")),
+            (bulk_scoring, "SCORES_DIR", os.path.join(data_dir, "scores")),
+            (dataset_refresh, "REFRESH_DIR", os.path.join(data_dir, "refresh")),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        review_store.clear_cache()
+        bulk_scoring._scores_cache.clear()
+        aggregate_store._states.clear()
+        aggregate_store._known_ids.clear()
+        self.addCleanup(review_store.clear_cache)
+
+        # The stored workbook holds the first four reviews, Steam has two more
+        self.raw = [_raw_review(number, text) for number, text in enumerate(TEXTS)]
+        dataset_refresh.write_dataset(APP_ID, fetch_steam_data.reviews_to_dataframe(self.raw[:4]))
+
+    def refresh(self):
+        newest_first = sorted(self.raw, key=lambda review: review["timestamp_created"], reverse=True)
+        with StandInSteam([_page(newest_first, "A"), _page([], "A")]) as server:
+            fetcher = fetch_steam_data.SteamReviewFetcher(base_url=server.url, requests_per_second=0)
+            self.addCleanup(fetcher.close)
+            return dataset_refresh.refresh_dataset(APP_ID, fetcher=fetcher)
+
+    def assert_scores_match_workbook(self):
+        dataset = review_store.get_dataset(APP_ID)
+        scores = bulk_scoring.load_dataset_scores(APP_ID)
+        self.assertIsNotNone(scores, "score file is not marked as built from the current workbook")
+        self.assertEqual(scores['review_id'].tolist(), [int(i) for i in np.asarray(dataset.column('review_id'))])
+        expected = bulk_scoring.score_texts(dataset.text('review_text'))
+        np.testing.assert_allclose(scores['total_score'].to_numpy(), expected['total_score'].to_numpy())
+
+    def test_refresh_scores_reviews_missing_from_the_score_file(self):
+        bulk_scoring.get_dataset_scores(APP_ID)
+        # The workbook changed some other way: the score file lacks one of its rows
+        scores, info = bulk_scoring.read_score_file(APP_ID)
+        bulk_scoring.write_score_file(APP_ID, scores.iloc[1:], info["built_from"], info["lexicon_version"])
+        bulk_scoring._scores_cache.clear()
+
+        summary = self.refresh()
+
+        self.assertEqual(summary["new_reviews"], 2)
+        self.assertEqual(summary["total_reviews"], 6)
+        self.assert_scores_match_workbook()
+        self.assertEqual(dataset_refresh.load_refresh_state(APP_ID)["total_reviews"], 6)
+
+    def test_ids_survive_the_workbook_round_trip(self):
+        self.refresh()
+        dataset = review_store.get_dataset(APP_ID)
+        newest_first = sorted(self.raw, key=lambda review: review["timestamp_created"], reverse=True)
+        # review_id is stored as a number, the 17-digit steam_id as text, both read back exactly
+        self.assertEqual(np.asarray(dataset.column('review_id')).tolist(),
+                         [int(review["recommendationid"]) for review in newest_first])
+        self.assertEqual(np.asarray(dataset.column('steam_id')).tolist(),
+                         [int(review["author"]["steamid"]) for review in newest_first])
+
+    def test_failed_score_update_leaves_the_workbook_alone(self):
+        bulk_scoring.get_dataset_scores(APP_ID)
+        path = review_store.source_path(APP_ID)
+        before = review_store.source_fingerprint(APP_ID)
+        with mock.patch.object(bulk_scoring, "score_texts", side_effect=RuntimeError("scoring failed")):
+            with self.assertRaises(RuntimeError):
+                self.refresh()
+        self.assertEqual(review_store.source_fingerprint(APP_ID), before)
+        self.assertFalse(os.path.exists(path + ".tmp.xlsx"))
+        self.assertIsNone(dataset_refresh.load_refresh_state(APP_ID))
+
+        # Running it again finishes the job
+        self.assertEqual(self.refresh()["new_reviews"], 2)
+        self.assert_scores_match_workbook()
+
+    def test_failure_after_the_swap_is_repaired_by_the_next_refresh(self):
+        bulk_scoring.get_dataset_scores(APP_ID)
+        with mock.patch.object(aggregate_store, "add_reviews", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                self.refresh()
+
+        summary = self.refresh()
+
+        self.assertEqual(summary["new_reviews"], 0)
+        self.assertEqual(summary["total_reviews"], 6)
+        self.assertEqual(aggregate_store.get_aggregates(APP_ID)["total"]["count"], 6)
+        self.assert_scores_match_workbook()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,273 @@
+"""
+Retry, backoff, rate-limit and concurrent-stream behaviour of SteamReviewFetcher,
+run against a local stand-in for the Steam reviews endpoint (no network access needed).
+
+Run with:  python -m pytest tests
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+import requests
+
+import fetch_steam_data
+
+
+def _page(reviews, cursor):
+    return 200, {}, {"success": 1, "reviews": reviews, "cursor": cursor}
+
+
+def _pages_by_language(pages):
+    """
+    Responder for concurrent streams: pages maps language -> {cursor: (reviews, next cursor)},
+    so every stream gets its own cursor chain whatever order the requests arrive in
+    """
+    def respond(params):
+        reviews, cursor = pages[params["language"][0]][params["cursor"][0]]
+        return _page(reviews, cursor)
+    return respond
+
+
+class StandInSteam:
+    """
+    HTTP server answering with scripted (status, headers, body) responses, in order,
+    or with whatever a responder function returns for the request's query parameters
+    """
+
+    def __init__(self, responses):
+        self.responder = responses if callable(responses) else None
+        self.responses = [] if callable(responses) else list(responses)
+        self.requests = []      # (time.monotonic(), query parameters) of every request
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                with server._lock:
+                    server.requests.append((time.monotonic(), params))
+                    if server.responder is not None:
+                        status, headers, body = server.responder(params)
+                    else:
+                        # The last response repeats once the script runs out
+                        status, headers, body = server.responses.pop(0) if len(server.responses) > 1 else server.responses[0]
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/appreviews/{{app_id}}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SteamReviewFetcherTest(unittest.TestCase):
+
+    def make_fetcher(self, server, **options):
+        options = {"requests_per_second": 0, "max_retries": 3, "backoff_base": 0.01, "timeout": 5, **options}
+        fetcher = fetch_steam_data.SteamReviewFetcher(base_url=server.url, **options)
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def test_retries_429_and_5xx_until_a_page_arrives(self):
+        responses = [(429, {}, {}), (503, {}, {}), (500, {}, {}), _page([{"recommendationid": "1"}], "*")]
+        with StandInSteam(responses) as server:
+            data = self.make_fetcher(server).get_page(440, {"json": 1, "cursor": "*"})
+        self.assertEqual(data["reviews"], [{"recommendationid": "1"}])
+        self.assertEqual(len(server.requests), 4)
+
+    def test_honours_retry_after(self):
+        with StandInSteam([(429, {"Retry-After": "7"}, {}), _page([], "*")]) as server:
+            fetcher = self.make_fetcher(server)
+            with mock.patch.object(fetch_steam_data.time, "sleep") as sleep:
+                fetcher.get_page(440, {"json": 1})
+        sleep.assert_called_once_with(7.0)
+
+    def test_retry_after_is_capped_by_backoff_max(self):
+        with StandInSteam([(503, {"Retry-After": "3600"}, {}), _page([], "*")]) as server:
+            fetcher = self.make_fetcher(server, backoff_max=2.5)
+            with mock.patch.object(fetch_steam_data.time, "sleep") as sleep:
+                fetcher.get_page(440, {"json": 1})
+        sleep.assert_called_once_with(2.5)
+
+    def test_backoff_without_retry_after_grows_exponentially_with_jitter(self):
+        with StandInSteam([(502, {}, {})] * 3 + [_page([], "*")]) as server:
+            fetcher = self.make_fetcher(server, backoff_base=1.0, backoff_max=60.0)
+            with mock.patch.object(fetch_steam_data.time, "sleep") as sleep:
+                fetcher.get_page(440, {"json": 1})
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 3)
+        for attempt, delay in enumerate(delays):
+            self.assertTrue(0 <= delay <= 2 ** attempt, delays)
+
+    def test_gives_up_after_max_retries(self):
+        with StandInSteam([(503, {}, {})]) as server:
+            with self.assertRaises(requests.HTTPError) as raised:
+                self.make_fetcher(server, max_retries=2).get_page(440, {"json": 1})
+        self.assertEqual(raised.exception.response.status_code, 503)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_other_client_errors_are_not_retried(self):
+        with StandInSteam([(404, {}, {})]) as server:
+            with self.assertRaises(requests.HTTPError):
+                self.make_fetcher(server).get_page(440, {"json": 1})
+        self.assertEqual(len(server.requests), 1)
+
+    def test_iter_pages_follows_the_cursor_until_an_empty_page(self):
+        responses = [_page([{"recommendationid": "1"}], "A"), _page([{"recommendationid": "2"}], "B"), _page([], "B")]
+        with StandInSteam(responses) as server:
+            reviews = self.make_fetcher(server).fetch_stream(440, language="english")
+        self.assertEqual([review["recommendationid"] for review in reviews], ["1", "2"])
+        self.assertEqual([params["cursor"][0] for _, params in server.requests], ["*", "A", "B"])
+        self.assertEqual(server.requests[0][1]["language"], ["english"])
+
+    def test_injected_session_is_used_and_left_open(self):
+        session = requests.Session()
+        self.addCleanup(session.close)
+        with StandInSteam([_page([], "*")]) as server:
+            fetcher = self.make_fetcher(server, session=session)
+            with mock.patch.object(session, "get", wraps=session.get) as get:
+                fetcher.get_page(440, {"json": 1})
+            fetcher.close()
+        get.assert_called_once()
+        # Still usable after the fetcher closed
+        self.assertIs(fetcher.session, session)
+
+
+class ConcurrentStreamsTest(unittest.TestCase):
+    """Several cursor streams at once through one fetcher and its shared RateLimiter"""
+
+    PAGES = {
+        "english": {"*": ([{"recommendationid": "e1"}], "E1"), "E1": ([{"recommendationid": "e2"}], "E2"),
+                    "E2": ([], "E2")},
+        "german": {"*": ([{"recommendationid": "g1"}], "G1"), "G1": ([{"recommendationid": "g2"}], "G2"),
+                   "G2": ([], "G2")},
+        "french": {"*": ([{"recommendationid": "f1"}], "F1"), "F1": ([], "F1")},
+    }
+
+    def cursors_by_language(self, server):
+        cursors = {}
+        for _, params in server.requests:
+            cursors.setdefault(params["language"][0], []).append(params["cursor"][0])
+        return cursors
+
+    def test_fetch_many_keeps_every_stream_on_its_own_cursor(self):
+        with StandInSteam(_pages_by_language(self.PAGES)) as server:
+            fetcher = fetch_steam_data.SteamReviewFetcher(base_url=server.url, requests_per_second=20, max_workers=3)
+            self.addCleanup(fetcher.close)
+            results = fetcher.fetch_many([{"app_id": 440, "language": language}
+                                          for language in ("english", "german", "french")])
+
+        self.assertEqual([[review["recommendationid"] for review in reviews] for reviews in results],
+                         [["e1", "e2"], ["g1", "g2"], ["f1"]])
+        self.assertEqual(self.cursors_by_language(server),
+                         {"english": ["*", "E1", "E2"], "german": ["*", "G1", "G2"], "french": ["*", "F1"]})
+        # The streams overlapped but all 8 requests still went through the one limiter at 20 per second
+        times = sorted(request_time for request_time, _ in server.requests)
+        self.assertEqual(len(times), 8)
+        self.assertGreaterEqual(times[-1] - times[0], 7 * 0.05 - 0.03)
+
+    def test_concurrent_streams_to_disk_write_their_own_files(self):
+        directories = {language: tempfile.mkdtemp() for language in ("english", "german")}
+        for directory in directories.values():
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with StandInSteam(_pages_by_language(self.PAGES)) as server:
+            fetcher = fetch_steam_data.SteamReviewFetcher(base_url=server.url, requests_per_second=20)
+            self.addCleanup(fetcher.close)
+            threads = [threading.Thread(target=fetch_steam_data.stream_steam_reviews, args=(440,),
+                                        kwargs={"language": language, "directory": directory, "fetcher": fetcher})
+                       for language, directory in directories.items()]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for language, directory in directories.items():
+            with open(os.path.join(directory, fetch_steam_data.STREAM_STATE_FILE), "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.assertTrue(state["done"])
+            self.assertEqual(state["options"]["language"], language)
+            self.assertEqual(state["cursor"], language[0].upper() + "2")
+            with open(os.path.join(directory, "reviews-00001.jsonl"), "r", encoding="utf-8") as f:
+                ids = [json.loads(line)["recommendationid"] for line in f]
+            self.assertEqual(ids, [language[0] + "1", language[0] + "2"])
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_spaces_requests_across_threads(self):
+        limiter = fetch_steam_data.RateLimiter(20)
+        times = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(5):
+                limiter.wait()
+                with lock:
+                    times.append(time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        times.sort()
+        # 20 requests at 20 per second take at least 19 intervals of 50 ms
+        self.assertGreaterEqual(times[-1] - times[0], 19 * 0.05 - 0.02)
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        self.assertGreaterEqual(min(gaps), 0.05 - 0.02)
+
+    def test_shared_limiter_limits_every_fetcher_together(self):
+        limiter = fetch_steam_data.RateLimiter(20)
+        with StandInSteam([_page([], "*")]) as server:
+            fetchers = [fetch_steam_data.SteamReviewFetcher(base_url=server.url, rate_limiter=limiter)
+                        for _ in range(3)]
+            threads = [threading.Thread(target=lambda fetcher=fetcher: [fetcher.get_page(440, {}) for _ in range(4)])
+                       for fetcher in fetchers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for fetcher in fetchers:
+                fetcher.close()
+        times = sorted(request_time for request_time, _ in server.requests)
+        self.assertEqual(len(times), 12)
+        self.assertGreaterEqual(times[-1] - times[0], 11 * 0.05 - 0.03)
+
+    def test_zero_rate_means_no_waiting(self):
+        limiter = fetch_steam_data.RateLimiter(0)
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.wait()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()